@@ -1,10 +1,19 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import logging
 import os
+import threading
+import time
 import urllib.parse
-from sqlite3 import IntegrityError
+from typing import TYPE_CHECKING
 
 from flask import (
     Flask,
     Response,
+    abort,
+    before_render_template,
     g,
     jsonify,
     make_response,
@@ -12,17 +21,28 @@ from flask import (
     render_template,
     request,
     session,
+    template_rendered,
 )
 from flask_babel import Babel, _
 from flask_babel_js import BabelJS
 
 from constraint import Constraint
-from databaseHandler import DatabaseHandler
+from databaseHandler import ConnectionPool, ConnectionProfile, DatabaseHandler
 from exchange import Exchange
-from participant import (
-    Participant,
+from exchangeCache import ExchangeCache
+from instrumentation import (
+    Metrics,
+    QueryProfiler,
+    RequestMetrics,
+    format_metric,
 )
-from utils import get_pairing_with_probabilities, slugify
+from instrumentation import logger as slow_query_logger
+from participant import Participant
+from renderCache import PageKey, RenderCache
+from utils import PairingStatistics, get_pairing_exact, pairing_solvers, slugify
+
+if TYPE_CHECKING:
+    from match import Match
 
 app = Flask(__name__)
 
@@ -35,8 +55,42 @@ def get_locale():
 
 app.config["BABEL_TRANSLATION_DIRECTORIES"] = "translations"
 app.config["BABEL_DEFAULT_LOCALE"] = "en"
+# The exact solver is about 5 times slower than sampling, see benchmarks/pairing.py
+app.config["PAIRING_SOLVER"] = os.environ.get("PAIRING_SOLVER", "sampling")
+if app.config["PAIRING_SOLVER"] not in pairing_solvers:
+    raise ValueError(
+        f"Unknown PAIRING_SOLVER '{app.config['PAIRING_SOLVER']}', "
+        f"use one of {', '.join(pairing_solvers)}!",
+    )
+# Seconds after which the parallel solver gives up, see get_pairing_parallel
+app.config["PAIRING_TIME_BUDGET"] = float(os.environ.get("PAIRING_TIME_BUDGET", 10.0))
+app.config["DATABASE"] = os.environ.get("DATABASE", "db.sqlite")
+# Settings of SQLite connections, see ConnectionProfile
+app.config["SQLITE_JOURNAL_MODE"] = os.environ.get("SQLITE_JOURNAL_MODE", "wal")
+app.config["SQLITE_SYNCHRONOUS"] = os.environ.get("SQLITE_SYNCHRONOUS", "normal")
+app.config["SQLITE_BUSY_TIMEOUT"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000))
+app.config["SQLITE_MMAP_SIZE"] = int(
+    os.environ.get("SQLITE_MMAP_SIZE", 64 * 1024 * 1024),
+)
+app.config["SQLITE_CACHE_SIZE"] = int(os.environ.get("SQLITE_CACHE_SIZE", -16000))
+app.config["SQLITE_WRITE_RETRIES"] = int(os.environ.get("SQLITE_WRITE_RETRIES", 5))
+app.config["SQLITE_RETRY_BACKOFF"] = float(
+    os.environ.get("SQLITE_RETRY_BACKOFF", 0.05),
+)
+app.config["EXCHANGE_CACHE_SIZE"] = 256
+app.config["MAX_CHECKED_NAMES"] = 1000
+app.config["STATIC_MAX_AGE"] = 365 * 24 * 60 * 60
+app.config["RENDER_CACHE_SIZE"] = 16 * 1024 * 1024
+app.config["INSTRUMENTATION"] = True
+app.config["METRICS_ALLOWED_ADDRESSES"] = ["127.0.0.1", "::1"]
+app.config["QUERY_PROFILING"] = bool(os.environ.get("QUERY_PROFILING"))
+app.config["SLOW_QUERY_THRESHOLD"] = float(os.environ.get("SLOW_QUERY_THRESHOLD", 0.05))
+app.config["SLOW_QUERY_LOG"] = os.environ.get("SLOW_QUERY_LOG", "slow_queries.log")
 babel = Babel(app, locale_selector=get_locale)
 babel_js = BabelJS(app)
+exchange_cache = ExchangeCache(app.config["EXCHANGE_CACHE_SIZE"])
+render_cache = RenderCache(app.config["RENDER_CACHE_SIZE"])
+metrics = Metrics()
 
 app.jinja_env.globals.update(zip=zip)  # Let me use zip in jinja
 app.jinja_env.filters["quote_plus"] = lambda u: urllib.parse.quote_plus(u)
@@ -47,9 +101,160 @@ def inject_gettext():
     return {"_": _}
 
 
+@app.before_request
+def start_request_metrics():
+    if app.config["INSTRUMENTATION"]:
+        g.request_metrics = RequestMetrics()
+
+
+def get_statement_observer():
+    request_metrics = g.get("request_metrics")
+    return None if request_metrics is None else request_metrics.record_statement
+
+
+@before_render_template.connect_via(app)
+def start_render_timer(_sender, **_extra: object):
+    request_metrics = g.get("request_metrics")
+    if request_metrics is not None:
+        request_metrics.render_started()
+
+
+@template_rendered.connect_via(app)
+def stop_render_timer(_sender, **_extra: object):
+    request_metrics = g.get("request_metrics")
+    if request_metrics is not None:
+        request_metrics.render_finished()
+
+
+# Registered first, so it runs after all other after_request functions
+@app.after_request
+def record_request_metrics(response):
+    request_metrics = g.get("request_metrics")
+    if request_metrics is None:
+        return response
+    total_seconds = request_metrics.elapsed()
+    response.headers["Server-Timing"] = request_metrics.server_timing(total_seconds)
+    metrics.record(
+        request.endpoint or "none",
+        request.method,
+        response.status_code,
+        request_metrics,
+        total_seconds,
+    )
+    return response
+
+
+static_file_hashes = {}
+
+
+def get_static_file_hash(filename: str) -> str | None:
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if static_file_hashes.get(filename, (None,))[0] != mtime:
+        with open(path, "rb") as f:
+            file_hash = hashlib.sha256(f.read()).hexdigest()[:12]
+        static_file_hashes[filename] = (mtime, file_hash)
+    return static_file_hashes[filename][1]
+
+
+@app.url_defaults
+def add_static_file_hash(endpoint, values):
+    # A new URL for every version of a file, so they can be cached forever
+    if endpoint == "static" and "filename" in values and "v" not in values:
+        file_hash = get_static_file_hash(values["filename"])
+        if file_hash is not None:
+            values["v"] = file_hash
+
+
+@app.after_request
+def cache_static_files(response):
+    if (
+        request.endpoint == "static"
+        and response.status_code == 200
+        and request.args.get("v") is not None
+        and request.args.get("v") == get_static_file_hash(request.view_args["filename"])
+    ):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config["STATIC_MAX_AGE"]
+        response.cache_control.immutable = True
+    return response
+
+
+@functools.cache
+def get_content_version():
+    # Pages embed templates, translations and static file URLs, so their ETags
+    # have to change with any of them
+    content_hash = hashlib.sha256()
+    for folder in ["templates", "translations", "static"]:
+        for root, dirs, files in os.walk(os.path.join(app.root_path, folder)):
+            dirs.sort()
+            for filename in sorted(files):
+                with open(os.path.join(root, filename), "rb") as f:
+                    content_hash.update(f.read())
+    return content_hash.hexdigest()[:12]
+
+
+db_pool_lock = threading.Lock()
+
+
+def get_connection_profile():
+    return ConnectionProfile(
+        journal_mode=app.config["SQLITE_JOURNAL_MODE"],
+        synchronous=app.config["SQLITE_SYNCHRONOUS"],
+        busy_timeout=app.config["SQLITE_BUSY_TIMEOUT"],
+        mmap_size=app.config["SQLITE_MMAP_SIZE"],
+        cache_size=app.config["SQLITE_CACHE_SIZE"],
+        write_retries=app.config["SQLITE_WRITE_RETRIES"],
+        retry_backoff=app.config["SQLITE_RETRY_BACKOFF"],
+    )
+
+
+def get_db_pool():
+    # Creating the pool migrates the database, so only do it once
+    with db_pool_lock:
+        if "db_pool" not in app.extensions:
+            database = app.config["DATABASE"]
+            if database.startswith(("postgres://", "postgresql://")):
+                # Only needed, and only installed, when using PostgreSQL
+                from postgresHandler import PostgresConnectionPool, PostgresHandler
+
+                app.extensions["db_handler"] = PostgresHandler
+                app.extensions["db_pool"] = PostgresConnectionPool(database)
+            else:
+                app.extensions["db_handler"] = DatabaseHandler
+                app.extensions["db_pool"] = ConnectionPool(
+                    database,
+                    get_connection_profile(),
+                )
+    return app.extensions["db_pool"]
+
+
+def get_query_profiler():
+    if not app.config["QUERY_PROFILING"]:
+        return None
+    with db_pool_lock:
+        if "query_profiler" not in app.extensions:
+            handler = logging.FileHandler(app.config["SLOW_QUERY_LOG"])
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            slow_query_logger.addHandler(handler)
+            app.extensions["query_profiler"] = QueryProfiler(
+                app.config["SLOW_QUERY_THRESHOLD"],
+            )
+    return app.extensions["query_profiler"]
+
+
 def get_db():
     if "db" not in g:
-        g.db = DatabaseHandler()
+        pool = get_db_pool()
+        g.db = app.extensions["db_handler"](
+            pool=pool,
+            observer=get_statement_observer(),
+            profiler=get_query_profiler(),
+        )
     return g.db
 
 
@@ -90,6 +295,37 @@ def route_to_exchange():
     return redirect(f"/{exchange_slug}/create/")
 
 
+def set_validators(response: Response, etag: str) -> Response:
+    # Clients have to revalidate, but get a 304 while nothing changed
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+
+def not_modified(etag: str) -> Response | None:
+    if request.if_none_match.contains(etag):
+        return set_validators(Response(status=304), etag)
+    return None
+
+
+def versioned_json(version: int, data: dict) -> Response:
+    return set_validators(jsonify(data), str(version))
+
+
+def get_page_locale() -> str:
+    return get_locale() or app.config["BABEL_DEFAULT_LOCALE"]
+
+
+def get_page_etag(version: int) -> str:
+    return f"{version}-{get_page_locale()}-{get_content_version()}"
+
+
+def versioned_page(version: int, page: str) -> Response:
+    response = set_validators(make_response(page), get_page_etag(version))
+    response.vary.add("Accept-Language")
+    return response
+
+
 @app.route("/check_exchange_name/")
 def check_exchange_name():
     name = request.args.get("name", "").strip()
@@ -97,7 +333,11 @@ def check_exchange_name():
     if not slug:
         return jsonify({"nameAvailable": False})
     db = get_db()
-    return jsonify({"nameAvailable": not db.exchange_exists(slug)})
+    version = db.get_exchange_version(slug)
+    response = not_modified(str(version))
+    if response is not None:
+        return response
+    return versioned_json(version, {"nameAvailable": version == 0})
 
 
 @app.route("/check_participant_name/")
@@ -106,7 +346,12 @@ def check_participant_name():
     new_name = request.args.get("newname", "").strip()
     old_name = request.args.get("oldname", "").strip()
     db = get_db()
-    return jsonify(
+    version = db.get_exchange_version(exchange_slug)
+    response = not_modified(str(version))
+    if response is not None:
+        return response
+    return versioned_json(
+        version,
         {
             "nameAvailable": db.participant_name_available(
                 exchange_slug,
@@ -117,6 +362,102 @@ def check_participant_name():
     )
 
 
+def is_list_of_strings(value: object) -> bool:
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+@app.route("/check_names/", methods=["POST"])
+def check_names():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400)
+    exchange_names = data.get("exchangeNames", [])
+    participant_names = data.get("participantNames", [])
+    exchange_slug = data.get("exchangeSlug", "")
+    old_name = data.get("oldName", "")
+    if not (
+        is_list_of_strings(exchange_names)
+        and is_list_of_strings(participant_names)
+        and isinstance(exchange_slug, str)
+        and isinstance(old_name, str)
+    ):
+        abort(400)
+    exchange_names = [name.strip() for name in exchange_names]
+    participant_names = [name.strip() for name in participant_names]
+    old_name = old_name.strip()
+    if len(exchange_names) + len(participant_names) > app.config["MAX_CHECKED_NAMES"]:
+        abort(413)
+    exchange_slugs = {name: slugify(name) for name in exchange_names}
+    db = get_db()
+    slugs_available, names_available = db.names_available(
+        [slug for slug in exchange_slugs.values() if slug],
+        exchange_slug,
+        participant_names,
+        old_name,
+    )
+    return jsonify(
+        {
+            "exchangeNames": {
+                name: slugs_available.get(slug, False)
+                for name, slug in exchange_slugs.items()
+            },
+            "participantNames": names_available,
+        },
+    )
+
+
+@app.route("/metrics")
+def view_metrics():
+    # Only meant to be scraped locally, it tells a lot about the traffic
+    if (
+        not app.config["INSTRUMENTATION"]
+        or request.remote_addr not in app.config["METRICS_ALLOWED_ADDRESSES"]
+    ):
+        abort(404)
+    extra_metrics = [
+        format_metric(
+            f"{name}_cache_{counter}_total",
+            "counter",
+            f"Lookups in the {name} cache that were {description}.",
+            [({}, getattr(cache, counter))],
+        )
+        for name, cache in [("exchange", exchange_cache), ("render", render_cache)]
+        for counter, description in [("hits", "cached"), ("misses", "not cached")]
+    ]
+    extra_metrics.append(
+        format_metric(
+            "render_cache_bytes",
+            "gauge",
+            "Memory taken up by cached pages.",
+            [({}, render_cache.size)],
+        ),
+    )
+    query_profiler = app.extensions.get("query_profiler")
+    if query_profiler is not None:
+        queries = query_profiler.queries()
+        extra_metrics.extend(
+            format_metric(
+                f"query_{name}_total",
+                "counter",
+                help_text,
+                [({"query": q["query"]}, q[key]) for q in queries],
+            )
+            for name, key, help_text in [
+                ("calls", "calls", "Executions of a normalized SQL statement."),
+                (
+                    "duration_seconds",
+                    "seconds",
+                    "Time spent executing a normalized SQL statement.",
+                ),
+                ("slow_calls", "slow_calls", "Slow executions of a SQL statement."),
+            ]
+        )
+    return Response(
+        metrics.render() + "".join(extra_metrics),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
 @app.route("/data-disclaimer/", methods=["GET"])
 def data_disclaimer():
     return render_template("data-disclaimer.html")
@@ -152,6 +493,29 @@ def view_create_exchange(exchange_slug, error_message=None, form_data=None):
     return response
 
 
+def generate_pairing(
+    participants: list[Participant],
+    constraints: list[Constraint],
+    statistics: PairingStatistics,
+) -> list[Match]:
+    solver = app.config["PAIRING_SOLVER"]
+    options = {}
+    if solver == "parallel":
+        options["time_budget"] = app.config["PAIRING_TIME_BUDGET"]
+    try:
+        return pairing_solvers[solver](
+            participants,
+            constraints,
+            statistics=statistics,
+            **options,
+        )
+    except ValueError:
+        # Sampling gives up on dense constraints that still allow a pairing
+        if solver != "sampling" or statistics.outcome not in ["unlikely", "exhausted"]:
+            raise
+    return get_pairing_exact(participants, constraints, statistics=statistics)
+
+
 def create_exchange(exchange_slug, form, exchange_name: str = None):
     if not exchange_name:
         exchange_name = form.getlist("exchangeName")[0]
@@ -183,8 +547,10 @@ def create_exchange(exchange_slug, form, exchange_name: str = None):
                 )
     except KeyError:
         return Response(status=422)
+    statistics = PairingStatistics()
+    start = time.perf_counter()
     try:
-        pairing = get_pairing_with_probabilities(participants, constraints)
+        pairing = generate_pairing(participants, constraints, statistics)
     except ValueError:
         return view_create_exchange(
             exchange_slug,
@@ -195,14 +561,21 @@ def create_exchange(exchange_slug, form, exchange_name: str = None):
             ),
             form_data=form,
         )
+    finally:
+        if "request_metrics" in g:
+            g.request_metrics.record_pairing(
+                statistics.attempts,
+                time.perf_counter() - start,
+            )
     exchange = Exchange(exchange_name, participants, constraints, pairing)
     db = get_db()
     try:
         db.create_exchange(exchange, participants, constraints, pairing)
-    except IntegrityError as e:
+    except db.IntegrityError as e:
         if db.exchange_exists(exchange_slug):
             return render_template("rename-exchange.html", form_data=form)
         raise e
+    exchange_cache.invalidate(exchange.slug)
     return redirect(f"/{exchange_slug}/")
 
 
@@ -223,15 +596,30 @@ def route_create_renamed_exchange():
 @app.route("/<exchange_slug>/")
 def view_exchange(exchange_slug):
     db = get_db()
-    if not db.exchange_exists(exchange_slug):
+    version = db.get_exchange_version(exchange_slug)
+    if version == 0:
         return redirect(f"/{exchange_slug}/create/")
-    exchange = db.get_exchange(exchange_slug)
-    return render_template(
+    response = not_modified(get_page_etag(version))
+    if response is not None:
+        return response
+    key = PageKey(
         "exchange-overview.html",
-        exchangeSlug=exchange_slug,
-        exchangeName=db.get_exchange_name(exchange_slug),
-        participants=exchange.participants,
+        exchange_slug,
+        "",
+        get_page_locale(),
+        version,
     )
+    page = render_cache.get(key)
+    if page is None:
+        exchange = exchange_cache.get_exchange(db, exchange_slug, version)
+        page = render_template(
+            key.template_name,
+            exchangeSlug=exchange_slug,
+            exchangeName=exchange.name,
+            participants=exchange.participants,
+        )
+        render_cache.put(key, page)
+    return versioned_page(version, page)
 
 
 @app.route(
@@ -241,25 +629,42 @@ def view_exchange(exchange_slug):
 def view_exchange_participant_result(exchange_slug, participant_name):
     participant_name = urllib.parse.unquote_plus(participant_name)
     db = get_db()
-    try:
-        active_name = db.get_active_name(exchange_slug, participant_name)
-        if participant_name != active_name:
-            return redirect(f"/{exchange_slug}/results/{active_name}")
-    except ValueError as e:
-        return not_found(e)
-    try:
-        giftee = db.get_giftee_for_giver(exchange_slug, participant_name)
-        giver = db.get_giver_for_giftee(exchange_slug, participant_name)
-    except ValueError as e:
-        return not_found(e)
-    return render_template(
+    version = db.get_exchange_version(exchange_slug)
+    key = PageKey(
         "exchange-user-result.html",
-        exchangeSlug=exchange_slug,
-        exchangeName=db.get_exchange_name(exchange_slug),
-        participantName=participant_name,
-        gifteeName=giftee.get_name(),
-        giverName=giver.get_name(),
+        exchange_slug,
+        participant_name,
+        get_page_locale(),
+        version,
     )
+    # Only pages for current names are cached, so no redirect is needed
+    page = render_cache.get(key)
+    if page is None:
+        # A result page only needs four names, not the whole exchange
+        try:
+            exchange_name, active_name, giftee_name, giver_name = (
+                db.get_participant_result(exchange_slug, participant_name)
+            )
+        except ValueError as e:
+            return not_found(e)
+        if participant_name != active_name:
+            return redirect(f"/{exchange_slug}/results/{active_name}")
+    # The ETag is the same for every participant, so only answer 304 once the
+    # name is known to be current
+    response = not_modified(get_page_etag(version))
+    if response is not None:
+        return response
+    if page is None:
+        page = render_template(
+            key.template_name,
+            exchangeSlug=exchange_slug,
+            exchangeName=exchange_name,
+            participantName=participant_name,
+            gifteeName=giftee_name,
+            giverName=giver_name,
+        )
+        render_cache.put(key, page)
+    return versioned_page(version, page)
 
 
 @app.route(
@@ -277,4 +682,6 @@ def rename_participant(exchange_slug, old_participant_name):
         old_participant_name,
         new_participant_name,
     )
+    exchange_cache.invalidate(exchange_slug)
+    render_cache.invalidate(exchange_slug)
     return redirect(f"/{exchange_slug}/results/{new_participant_name}")
@@ -0,0 +1 @@
+"""Scripts to measure the performance of Secret Gift Swap."""
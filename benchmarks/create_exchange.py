@@ -0,0 +1,127 @@
+"""Measure how long DatabaseHandler.create_exchange takes for growing exchanges.
+
+Run from the repository root with `python -m benchmarks.create_exchange`.
+"""
+
+import argparse
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from constraint import Constraint
+from databaseHandler import DatabaseHandler
+from exchange import Exchange
+from match import Match
+from participant import Participant
+
+
+def make_exchange(
+    name: str,
+    size: int,
+    constraints_per_participant: int,
+) -> Exchange:
+    """Generate a synthetic exchange.
+
+    Args:
+        name (str): Name of the exchange
+        size (int): Number of participants
+        constraints_per_participant (int): Number of constraints per giver
+
+    Returns:
+        Exchange: The exchange
+
+    """
+    participants = [Participant(names=f"Participant {i}") for i in range(size)]
+    constraints = [
+        Constraint(
+            participants[i].uuid,
+            participants[(i + offset) % size].uuid,
+            "1_past_exchange",
+        )
+        for i in range(size)
+        for offset in range(2, 2 + constraints_per_participant)
+    ]
+    pairing = [
+        Match(participants[i].uuid, participants[(i + 1) % size].uuid)
+        for i in range(size)
+    ]
+    return Exchange(name, participants, constraints, pairing)
+
+
+def benchmark(
+    sizes: list[int],
+    constraints_per_participant: int,
+    repeats: int,
+) -> list[dict]:
+    """Time create_exchange for every exchange size.
+
+    Args:
+        sizes (list[int]): Numbers of participants to measure
+        constraints_per_participant (int): Number of constraints per giver
+        repeats (int): How often to measure each size
+
+    Returns:
+        list[dict]: One result per size
+
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseHandler(str(Path(directory) / "db.sqlite"))
+        for size in sizes:
+            timings = []
+            for repeat in range(repeats):
+                exchange = make_exchange(
+                    f"Benchmark {size} {repeat}",
+                    size,
+                    constraints_per_participant,
+                )
+                start = time.perf_counter()
+                db.create_exchange(
+                    exchange,
+                    exchange.participants,
+                    exchange.constraints,
+                    exchange.pairing,
+                )
+                timings.append(time.perf_counter() - start)
+            results.append(
+                {
+                    "participants": size,
+                    "constraints": size * constraints_per_participant,
+                    "median_seconds": statistics.median(timings),
+                    "min_seconds": min(timings),
+                },
+            )
+        db.close_connection()
+    return results
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 5000],
+    )
+    parser.add_argument("--constraints-per-participant", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = benchmark(args.sizes, args.constraints_per_participant, args.repeats)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'participants':>12} {'constraints':>12} {'median ms':>10} {'min ms':>10}")
+    for r in results:
+        print(
+            f"{r['participants']:>12} {r['constraints']:>12} "
+            f"{r['median_seconds'] * 1000:>10.2f} {r['min_seconds'] * 1000:>10.2f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Simulate reveal day traffic on one large exchange and measure every route.
+
+Seeds a database with an exchange, then lets threads send a mix of result page
+views, renames and name availability checks for a while, and reports
+throughput and latency percentiles per route. By default requests go through
+the Flask test client in this process. With --url they go to a running server,
+which has to use the --database this script seeds.
+
+Run from the repository root with `python -m benchmarks.load_test`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from benchmarks.create_exchange import make_exchange
+from benchmarks.pairing import percentile
+from databaseHandler import DatabaseHandler
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+routes = ["results", "rename", "check_participant", "check_exchange"]
+
+
+def seed_database(database: str, size: int, constraints_per_participant: int) -> str:
+    """Create an exchange to run the load test against.
+
+    Args:
+        database (str): Path to the SQLite database
+        size (int): Number of participants
+        constraints_per_participant (int): Number of constraints per giver
+
+    Returns:
+        str: Slug of the exchange
+
+    """
+    exchange = make_exchange(
+        f"Load Test {time.time_ns()}",
+        size,
+        constraints_per_participant,
+    )
+    db = DatabaseHandler(database)
+    db.create_exchange(
+        exchange,
+        exchange.participants,
+        exchange.constraints,
+        exchange.pairing,
+    )
+    db.close_connection()
+    return exchange.slug
+
+
+def make_client(url: str | None, database: str) -> Callable[[str, str, dict], int]:
+    """Create a function sending one request, for use by a single thread.
+
+    Args:
+        url (str | None): Base URL of a running server, or None for the test client
+        database (str): Path to the SQLite database the test client should use
+
+    Returns:
+        Callable[[str, str, dict], int]: Takes method, path and form data,
+        returns the status code
+
+    """
+    if url is None:
+        # Only needed without a server
+        from app import app
+
+        app.config["DATABASE"] = database
+        client = app.test_client()
+
+        def send(method: str, path: str, data: dict) -> int:
+            return client.open(path, method=method, data=data).status_code
+
+        return send
+
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *_args: object) -> None:
+            return None
+
+    opener = urllib.request.build_opener(NoRedirect)
+
+    def send(method: str, path: str, data: dict) -> int:
+        body = urllib.parse.urlencode(data).encode() if method == "POST" else None
+        request = urllib.request.Request(url + path, data=body, method=method)
+        try:
+            with opener.open(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    return send
+
+
+def worker(
+    send: Callable[[str, str, dict], int],
+    slug: str,
+    names: list[str],
+    weights: list[float],
+    deadline: float,
+    rng: random.Random,
+) -> dict[str, list[tuple[float, int]]]:
+    """Send requests until the deadline.
+
+    Args:
+        send (Callable[[str, str, dict], int]): Sends one request
+        slug (str): Slug of the exchange
+        names (list[str]): Current names of the participants this thread may
+            rename, so threads don't rename the same participant
+        weights (list[float]): How often to use each route, in order of routes
+        deadline (float): time.perf_counter() at which to stop
+        rng (random.Random): Source of randomness
+
+    Returns:
+        dict[str, list[tuple[float, int]]]: Latency and status of every request,
+        by route
+
+    """
+    samples = {route: [] for route in routes}
+    renames = 0
+    while time.perf_counter() < deadline:
+        route = rng.choices(routes, weights)[0]
+        i = rng.randrange(len(names))
+        name = urllib.parse.quote(names[i], safe="")
+        if route == "results":
+            method, path, data = "GET", f"/{slug}/results/{name}", {}
+        elif route == "rename":
+            renames += 1
+            new_name = f"{names[i]} ({renames})"
+            method, path = "POST", f"/{slug}/results/{name}"
+            data = {"participant_name": new_name}
+        elif route == "check_participant":
+            new_name = urllib.parse.quote(f"Someone {rng.randrange(10**6)}")
+            method, data = "GET", {}
+            path = (
+                f"/check_participant_name/?exchangeslug={slug}"
+                f"&newname={new_name}&oldname={name}"
+            )
+        else:
+            method, data = "GET", {}
+            path = f"/check_exchange_name/?name=Exchange+{rng.randrange(10**6)}"
+        start = time.perf_counter()
+        status = send(method, path, data)
+        samples[route].append((time.perf_counter() - start, status))
+        if route == "rename" and status < 400:
+            names[i] = new_name
+    return samples
+
+
+def load_test(
+    size: int,
+    constraints_per_participant: int,
+    threads: int,
+    duration: float,
+    weights: list[float],
+    url: str | None,
+    database: str,
+    seed: int,
+) -> dict:
+    """Seed the database and run the load test.
+
+    Args:
+        size (int): Number of participants
+        constraints_per_participant (int): Number of constraints per giver
+        threads (int): Number of concurrent clients
+        duration (float): How long to send requests, in seconds
+        weights (list[float]): How often to use each route, in order of routes
+        url (str | None): Base URL of a running server, or None for the test client
+        database (str): Path to the SQLite database
+        seed (int): Seed for choosing requests
+
+    Returns:
+        dict: Overall throughput and statistics per route
+
+    """
+    slug = seed_database(database, size, constraints_per_participant)
+    all_names = [f"Participant {i}" for i in range(size)]
+    # Every thread renames its own share of participants
+    shares = [all_names[i::threads] for i in range(threads)]
+    results = [None] * threads
+
+    def run(i: int) -> None:
+        send = make_client(url, database)
+        results[i] = worker(
+            send,
+            slug,
+            shares[i],
+            weights,
+            deadline,
+            random.Random(seed + i),
+        )
+
+    deadline = time.perf_counter() + duration
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    per_route = {}
+    for route in routes:
+        samples = [s for result in results for s in result[route]]
+        if not samples:
+            continue
+        latencies = [latency for latency, _status in samples]
+        per_route[route] = {
+            "requests": len(samples),
+            "errors": sum(status >= 500 for _latency, status in samples),
+            "requests_per_second": len(samples) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+    return {
+        "participants": size,
+        "threads": threads,
+        "seconds": elapsed,
+        "requests_per_second": sum(r["requests"] for r in per_route.values()) / elapsed,
+        "routes": per_route,
+    }
+
+
+def main() -> None:
+    """Run the load test from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--participants", type=int, default=1000)
+    parser.add_argument("--constraints-per-participant", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument(
+        "--mix",
+        type=float,
+        nargs=len(routes),
+        default=[80, 2, 13, 5],
+        metavar=tuple(route.upper() for route in routes),
+        help="relative frequency of " + ", ".join(routes),
+    )
+    parser.add_argument(
+        "--url",
+        help="base URL of a running server, eg http://localhost:5000",
+    )
+    parser.add_argument(
+        "--database",
+        help="SQLite database to seed. Defaults to a temporary one",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        result = load_test(
+            args.participants,
+            args.constraints_per_participant,
+            args.threads,
+            args.duration,
+            args.mix,
+            args.url,
+            args.database or str(Path(directory) / "db.sqlite"),
+            args.seed,
+        )
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(
+        f"{result['participants']} participants, {result['threads']} threads: "
+        f"{result['requests_per_second']:.0f} requests/s",
+    )
+    print(
+        f"{'route':>18} {'requests':>9} {'errors':>7} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}",
+    )
+    for route, r in result["routes"].items():
+        print(
+            f"{route:>18} {r['requests']:>9} {r['errors']:>7} "
+            f"{r['requests_per_second']:>8.0f} {r['p50_ms']:>8.2f} "
+            f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
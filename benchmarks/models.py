@@ -0,0 +1,153 @@
+"""Compare memory and speed of the slotted models with dict-backed ones.
+
+The dict-backed classes below mirror Match and Constraint from before they got
+__slots__. Run from the repository root with `python -m benchmarks.models`.
+"""
+
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from collections.abc import Callable
+from uuid import UUID, uuid4
+
+from constraint import Constraint
+from match import Match
+
+
+class DictMatch:
+    """Match as it was before __slots__."""
+
+    def __init__(self, giver_id: UUID, giftee_id: UUID):
+        """Match one participant (giver) to another (giftee).
+
+        Args:
+            giver_id (UUID): Participant giving the gift
+            giftee_id (UUID): Participant receiving the gift
+
+        """
+        self.giver_id = giver_id
+        self.giftee_id = giftee_id
+
+    def __eq__(self, value: object):
+        if isinstance(value, DictMatch):
+            return self.giver_id == value.giver_id and self.giftee_id == value.giftee_id
+        return NotImplemented
+
+
+class DictConstraint:
+    """Constraint as it was before __slots__."""
+
+    def __init__(self, giver_id: UUID, giftee_id: UUID, probability_level: str):
+        """One single constraint.
+
+        Args:
+            giver_id (UUID): Person that would be giving the gift
+            giftee_id (UUID): Person that would be receiving the gift
+            probability_level (str): How much to avoid this pairing
+
+        """
+        self.giver_id = giver_id
+        self.giftee_id = giftee_id
+        self.probability_level = probability_level
+
+    def __eq__(self, value: object):
+        if isinstance(value, DictConstraint):
+            return self.__dict__ == value.__dict__
+        return NotImplemented
+
+
+def measure(
+    make: Callable[[UUID, UUID], object],
+    uuids: list[UUID],
+    repeats: int,
+) -> dict:
+    """Measure creating and comparing one object per pair of neighbouring ids.
+
+    Args:
+        make (Callable[[UUID, UUID], object]): Creates one object from two ids
+        uuids (list[UUID]): Ids to create objects from
+        repeats (int): How often to measure
+
+    Returns:
+        dict: Memory per object and median timings
+
+    """
+    pairs = list(zip(uuids, uuids[1:] + uuids[:1]))
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [make(giver, giftee) for giver, giftee in pairs]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(s.size_diff for s in after.compare_to(before, "filename"))
+    # Don't count the list holding the objects
+    allocated -= objects.__sizeof__()
+
+    create_timings = []
+    compare_timings = []
+    copies = [make(giver, giftee) for giver, giftee in pairs]
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for giver, giftee in pairs:
+            make(giver, giftee)
+        create_timings.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for a, b in zip(objects, copies):
+            a == b
+        compare_timings.append(time.perf_counter() - start)
+
+    return {
+        "bytes_per_object": allocated / len(objects),
+        "create_seconds": statistics.median(create_timings),
+        "compare_seconds": statistics.median(compare_timings),
+    }
+
+
+def benchmark(size: int, repeats: int) -> list[dict]:
+    """Measure the slotted and the dict-backed models.
+
+    Args:
+        size (int): Number of objects to create per model
+        repeats (int): How often to measure each model
+
+    Returns:
+        list[dict]: One result per model
+
+    """
+    uuids = [uuid4() for _ in range(size)]
+    models = {
+        "Match": Match,
+        "DictMatch": DictMatch,
+        "Constraint": lambda a, b: Constraint(a, b, "1_past_exchange"),
+        "DictConstraint": lambda a, b: DictConstraint(a, b, "1_past_exchange"),
+    }
+    return [
+        {"model": name, "objects": size, **measure(make, uuids, repeats)}
+        for name, make in models.items()
+    ]
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = benchmark(args.size, args.repeats)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'model':>15} {'bytes/object':>13} {'create ms':>10} {'compare ms':>11}")
+    for r in results:
+        print(
+            f"{r['model']:>15} {r['bytes_per_object']:>13.1f} "
+            f"{r['create_seconds'] * 1000:>10.2f} {r['compare_seconds'] * 1000:>11.2f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Measure how the pairing solvers scale with exchange size and constraint density.
+
+Generates synthetic exchanges for every combination of size and constraint
+density, and reports latency and failure rate of each solver, and how many
+pairings the rejection sampler draws until one is accepted. Results are
+reproducible for the same --seed.
+
+Run from the repository root with `python -m benchmarks.pairing`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+import warnings
+from pathlib import Path
+
+from constraint import Constraint, compile_constraints
+from participant import Participant
+from utils import _accept_pairing, _generate_pairing, pairing_solvers
+
+_past_levels = ["1_past_exchange", "2_past_exchange", "3_past_exchange"]
+
+
+def make_constraints(
+    participants: list[Participant],
+    never_per_participant: float,
+    past_per_participant: float,
+    rng: random.Random,
+) -> list[Constraint]:
+    """Generate random constraints between participants.
+
+    Args:
+        participants (list[Participant]): Participants to constrain
+        never_per_participant (float): Average number of "never" constraints
+            per giver
+        past_per_participant (float): Average number of past exchange constraints
+            per giver
+        rng (random.Random): Source of randomness
+
+    Returns:
+        list[Constraint]: The constraints
+
+    """
+
+    def count(per_participant: float) -> int:
+        whole = int(per_participant)
+        return whole + (rng.random() < per_participant - whole)
+
+    constraints = []
+    for i, giver in enumerate(participants):
+        for level_choices, per_participant in [
+            (["never"], never_per_participant),
+            (_past_levels, past_per_participant),
+        ]:
+            for _ in range(count(per_participant)):
+                j = rng.randrange(len(participants) - 1)
+                giftee = participants[j if j < i else j + 1]
+                constraints.append(
+                    Constraint(giver.uuid, giftee.uuid, rng.choice(level_choices)),
+                )
+    return constraints
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """Get a percentile of some values, interpolating between them.
+
+    Args:
+        values (list[float]): The values
+        percent (int): Percentile to get, from 1 to 99
+
+    Returns:
+        float: The percentile
+
+    """
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def measure_attempts(
+    participants: list[Participant],
+    constraints: list[Constraint],
+    repeats: int,
+    max_attempts: int,
+) -> dict:
+    """Count the pairings drawn until one is accepted, without raising probabilities.
+
+    Args:
+        participants (list[Participant]): Participants to pair
+        constraints (list[Constraint]): Constraints to respect
+        repeats (int): How often to measure
+        max_attempts (int): Most pairings to draw per measurement
+
+    Returns:
+        dict: Statistics about the attempts and their cost
+
+    """
+    constraint_index = compile_constraints(constraints)
+    attempts = []
+    generate_timings = []
+    accept_timings = []
+    for _ in range(repeats):
+        for attempt in range(1, max_attempts + 1):
+            start = time.perf_counter()
+            pairing = _generate_pairing(participants)
+            generate_timings.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            accepted = _accept_pairing(constraint_index, pairing)
+            accept_timings.append(time.perf_counter() - start)
+            if accepted:
+                attempts.append(attempt)
+                break
+    return {
+        "median": statistics.median(attempts) if attempts else None,
+        "p99": percentile(attempts, 99) if attempts else None,
+        "gave_up": repeats - len(attempts),
+        "generate_median_ms": statistics.median(generate_timings) * 1000,
+        "accept_median_ms": statistics.median(accept_timings) * 1000,
+    }
+
+
+def measure_solver(
+    solver_name: str,
+    participants: list[Participant],
+    constraints: list[Constraint],
+    repeats: int,
+    seed: int,
+) -> dict:
+    """Time a pairing solver.
+
+    Args:
+        solver_name (str): Name of the solver in utils.pairing_solvers
+        participants (list[Participant]): Participants to pair
+        constraints (list[Constraint]): Constraints to respect
+        repeats (int): How often to run the solver
+        seed (int): Seed for the random numbers of the solver
+
+    Returns:
+        dict: Latency and failure rate
+
+    """
+    solver = pairing_solvers[solver_name]
+    timings = []
+    failures = 0
+    for repeat in range(repeats):
+        random.seed(seed + repeat)
+        start = time.perf_counter()
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                solver(participants, constraints)
+        except ValueError:
+            failures += 1
+        timings.append(time.perf_counter() - start)
+    return {
+        "runs": repeats,
+        "failures": failures,
+        "failure_rate": failures / repeats,
+        "median_ms": statistics.median(timings) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+    }
+
+
+def benchmark(
+    sizes: list[int],
+    never_densities: list[float],
+    past_densities: list[float],
+    solvers: list[str],
+    repeats: int,
+    max_attempts: int,
+    seed: int,
+) -> list[dict]:
+    """Measure every solver for every combination of size and density.
+
+    Args:
+        sizes (list[int]): Numbers of participants
+        never_densities (list[float]): Average "never" constraints per participant
+        past_densities (list[float]): Average past exchange constraints
+            per participant
+        solvers (list[str]): Names of the solvers to measure
+        repeats (int): How often to measure each combination
+        max_attempts (int): Most pairings to draw when counting attempts
+        seed (int): Seed for generating exchanges and for the solvers
+
+    Returns:
+        list[dict]: One result per combination
+
+    """
+    results = []
+    for size in sizes:
+        for never in never_densities:
+            for past in past_densities:
+                rng = random.Random(f"{seed}-{size}-{never}-{past}")
+                participants = [
+                    Participant(names=f"Participant {i}") for i in range(size)
+                ]
+                constraints = make_constraints(participants, never, past, rng)
+                random.seed(seed)
+                results.append(
+                    {
+                        "participants": size,
+                        "never_per_participant": never,
+                        "past_per_participant": past,
+                        "constraints": len(constraints),
+                        "attempts": measure_attempts(
+                            participants,
+                            constraints,
+                            repeats,
+                            max_attempts,
+                        ),
+                        "solvers": {
+                            name: measure_solver(
+                                name,
+                                participants,
+                                constraints,
+                                repeats,
+                                seed,
+                            )
+                            for name in solvers
+                        },
+                    },
+                )
+    return results
+
+
+def _configuration(result: dict) -> tuple:
+    return (
+        result["participants"],
+        result["never_per_participant"],
+        result["past_per_participant"],
+    )
+
+
+def print_results(results: list[dict], baseline: list[dict] | None = None) -> None:
+    """Print results as a table, optionally with the change to a baseline.
+
+    Args:
+        results (list[dict]): Results of benchmark()
+        baseline (list[dict], optional): Earlier results to compare with.
+            Defaults to None.
+
+    """
+    baseline_by_configuration = {_configuration(r): r for r in baseline or []}
+    print(
+        f"{'participants':>12} {'never':>6} {'past':>5} {'attempts':>9} "
+        f"{'solver':>9} {'median ms':>10} {'p99 ms':>9} {'failures':>9}"
+        + (f" {'vs base':>8}" if baseline else ""),
+    )
+    for r in results:
+        attempts = r["attempts"]["median"]
+        for name, s in r["solvers"].items():
+            line = (
+                f"{r['participants']:>12} {r['never_per_participant']:>6} "
+                f"{r['past_per_participant']:>5} "
+                f"{'-' if attempts is None else attempts:>9} {name:>9} "
+                f"{s['median_ms']:>10.2f} {s['p99_ms']:>9.2f} "
+                f"{s['failure_rate']:>9.0%}"
+            )
+            before = baseline_by_configuration.get(_configuration(r), {})
+            before = before.get("solvers", {}).get(name)
+            if before is not None:
+                line += f" {s['median_ms'] / before['median_ms'] - 1:>+8.0%}"
+            print(line)
+
+
+def main() -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000],
+    )
+    parser.add_argument(
+        "--never",
+        type=float,
+        nargs="+",
+        default=[0, 0.5, 1],
+        help='average "never" constraints per participant',
+    )
+    parser.add_argument(
+        "--past",
+        type=float,
+        nargs="+",
+        default=[0, 1],
+        help="average past exchange constraints per participant",
+    )
+    parser.add_argument(
+        "--solvers",
+        nargs="+",
+        choices=sorted(pairing_solvers),
+        default=["sampling", "exact", "batched"],
+    )
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--max-attempts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        help="JSON results of an earlier run to compare with",
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    results = benchmark(
+        args.sizes,
+        args.never,
+        args.past,
+        args.solvers,
+        args.repeats,
+        args.max_attempts,
+        args.seed,
+    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    print_results(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
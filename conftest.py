@@ -0,0 +1,53 @@
+"""Fixtures shared by the tests of several modules."""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+import pytest
+
+from constraint import Constraint
+from exchange import Exchange
+from match import Match
+from participant import Participant
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+@pytest.fixture
+def exchange() -> Exchange:
+    """Exchange of three participants, one of them renamed, with one constraint."""
+    pa = Participant(names="Alice")
+    pb = Participant(names=["Bob", "Robert"], active_name=1)
+    pc = Participant(names="Carol")
+    participants = [pa, pb, pc]
+    constraints = [Constraint(pa.uuid, pb.uuid, "never")]
+    pairing = [
+        Match(pa.uuid, pc.uuid),
+        Match(pc.uuid, pb.uuid),
+        Match(pb.uuid, pa.uuid),
+    ]
+    return Exchange("Test Exchange", participants, constraints, pairing)
+
+
+@pytest.fixture
+def postgres_conninfo() -> Iterator[str]:
+    """Connection string for an empty schema in the POSTGRES_TEST_DSN database.
+
+    Skips the test if POSTGRES_TEST_DSN is not set or psycopg is missing.
+    """
+    dsn = os.environ.get("POSTGRES_TEST_DSN")
+    if dsn is None:
+        pytest.skip("POSTGRES_TEST_DSN is not set")
+    psycopg = pytest.importorskip("psycopg")
+    pytest.importorskip("psycopg_pool")
+    # Every test gets an empty schema of its own
+    schema = f"test_{uuid4().hex}"
+    with psycopg.connect(dsn, autocommit=True) as connection:
+        connection.execute(f"CREATE SCHEMA {schema}")
+    yield psycopg.conninfo.make_conninfo(dsn, options=f"-csearch_path={schema}")
+    with psycopg.connect(dsn, autocommit=True) as connection:
+        connection.execute(f"DROP SCHEMA {schema} CASCADE")
@@ -13,9 +13,16 @@ matching_probabilities = {
     "none": 1,
 }
 
+_level_order = {level: i for i, level in enumerate(matching_probabilities)}
+
 
 class Constraint:
-    """One constraint for who should not give a gift to whom."""
+    """One constraint for who should not give a gift to whom.
+
+    Constraints are hashable, so they must not be changed once created.
+    """
+
+    __slots__ = ("giftee_id", "giver_id", "probability_level")
 
     def __init__(
         self,
@@ -44,9 +51,16 @@ class Constraint:
 
     def __eq__(self, value: any):
         if isinstance(value, Constraint):
-            return self.__dict__ == value.__dict__
+            return (self.giver_id, self.giftee_id, self.probability_level) == (
+                value.giver_id,
+                value.giftee_id,
+                value.probability_level,
+            )
         return NotImplemented
 
+    def __hash__(self):
+        return hash((self.giver_id, self.giftee_id, self.probability_level))
+
     def __str__(self):
         arrow = "↔" if self.probability_level == "never" else "→"
         return f"{self.giver_id} {arrow} {self.giftee_id}: {self.probability_level}"
@@ -58,19 +72,90 @@ class Constraint:
         )
 
 
+class ConstraintIndex:
+    """Precompiled lookup of the matching probability for pairs of participants."""
+
+    def __init__(self, constraints: list[Constraint]):
+        """Compile a list of constraints into a lookup table.
+
+        Every restricted pair is stored with its strictest probability level,
+        including the reverse direction of "never" constraints.
+
+        Args:
+            constraints (list[Constraint]): Constraints to compile
+
+        """
+        self.constraints = constraints
+        self.levels = {}
+        for c in constraints:
+            pairs = [(c.giver_id, c.giftee_id)]
+            if c.probability_level == "never":
+                pairs.append((c.giftee_id, c.giver_id))
+            for pair in pairs:
+                if pair not in self.levels or (
+                    _level_order[c.probability_level] < _level_order[self.levels[pair]]
+                ):
+                    self.levels[pair] = c.probability_level
+        self.probabilities = {
+            pair: matching_probabilities[level] for pair, level in self.levels.items()
+        }
+
+    def get_probability(self, giver_id: UUID, giftee_id: UUID) -> float:
+        """Get the intended probability of matching a pair.
+
+        Args:
+            giver_id (UUID): Participant giving the gift
+            giftee_id (UUID): Participant receiving the gift
+
+        Returns:
+            float: Intended probability of matching
+
+        """
+        return self.probabilities.get(
+            (giver_id, giftee_id),
+            matching_probabilities["none"],
+        )
+
+    def __contains__(self, pair: tuple[UUID, UUID]) -> bool:
+        return pair in self.probabilities
+
+    def __len__(self) -> int:
+        return len(self.constraints)
+
+
+def compile_constraints(
+    constraints: list[Constraint] | ConstraintIndex,
+) -> ConstraintIndex:
+    """Get a constraint index, compiling the constraints if necessary.
+
+    Args:
+        constraints (list[Constraint] | ConstraintIndex): Constraints or their index
+
+    Returns:
+        ConstraintIndex: Index of the constraints
+
+    """
+    if isinstance(constraints, ConstraintIndex):
+        return constraints
+    return ConstraintIndex(constraints)
+
+
 def get_restricted_pairs(
-    constraints: list[Constraint],
+    constraints: list[Constraint] | ConstraintIndex,
 ) -> list[tuple[UUID, UUID]]:
     """Get all pairs restricted by the constraints.
 
     Args:
-        constraints (list[Constraint]): List of constraints
+        constraints (list[Constraint] | ConstraintIndex): List of constraints,
+            or their index
 
     Returns:
         list[tuple[UUID, UUID]]: list of restricted pairings.
         First entry is the giver, second the giftee.
 
     """
+    if isinstance(constraints, ConstraintIndex):
+        return list(constraints.probabilities)
     result = []
     for c in constraints:
         result.append((c.giver_id, c.giftee_id))
@@ -80,14 +165,15 @@ def get_restricted_pairs(
 
 
 def get_probability_from_constraints(
-    constraints: list[Constraint],
+    constraints: list[Constraint] | ConstraintIndex,
     giver_id: UUID,
     giftee_id: UUID,
 ) -> float:
     """Find matching probability for a given pair in a list of constraints.
 
     Args:
-        constraints (list[Constraint]): List of constraints to search
+        constraints (list[Constraint] | ConstraintIndex): List of constraints to
+            search, or their index
         giver_id (UUID): Participant giving the gift
         giftee_id (UUID): Participant receiving the gift
 
@@ -95,12 +181,12 @@ def get_probability_from_constraints(
         float: Intended probability of matching
 
     """
+    if isinstance(constraints, ConstraintIndex):
+        return constraints.get_probability(giver_id, giftee_id)
     result = "none"
     for c in constraints:
         if c.giver_id == giver_id and c.giftee_id == giftee_id:
-            if list(matching_probabilities.keys()).index(c.probability_level) < list(
-                matching_probabilities.keys(),
-            ).index(result):
+            if _level_order[c.probability_level] < _level_order[result]:
                 result = c.probability_level
         elif (
             c.giver_id == giftee_id
@@ -111,27 +197,35 @@ def get_probability_from_constraints(
     return matching_probabilities[result]
 
 
-def get_used_constraint_levels_from_constraints(constraints: list[Constraint]) -> list:
+def get_used_constraint_levels_from_constraints(
+    constraints: list[Constraint] | ConstraintIndex,
+) -> list:
     """Get all constraint levels form a list of constraints.
 
     Args:
-        constraints (list[Constraint]): List of constraints
+        constraints (list[Constraint] | ConstraintIndex): List of constraints,
+            or their index
 
     Returns:
         list: Used constraint levels
 
     """
+    if isinstance(constraints, ConstraintIndex):
+        constraints = constraints.constraints
     result = set()
     for c in constraints:
         result.add(c.probability_level)
     return list(result)
 
 
-def get_all_probability_values_from_constraints(constraints: list[Constraint]) -> list:
+def get_all_probability_values_from_constraints(
+    constraints: list[Constraint] | ConstraintIndex,
+) -> list:
     """Get all probability levels used in a list of constraints.
 
     Args:
-        constraints (list[Constraint]): List of constraints
+        constraints (list[Constraint] | ConstraintIndex): List of constraints,
+            or their index
 
     Returns:
         list: Probability levels
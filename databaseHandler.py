@@ -1,40 +1,33 @@
+from __future__ import annotations
+
+import functools
+import random
 import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Callable
 from uuid import UUID
 
 from constraint import Constraint
 from exchange import Exchange
+from instrumentation import QueryProfiler, observe_cursor
 from match import Match
 from participant import Participant
+from storage import StorageBackend
 
-
-class DatabaseHandler:
-    """Manages communication with the database."""
-
-    def __init__(self, db_path: str = "db.sqlite"):
-        """Manages communication with the database.
-
-        Args:
-            db_path (str, optional): Path to SQLite database. Defaults to "db.sqlite".
-
-        """
-        self.db_path = db_path
-        self.connection = sqlite3.connect(self.db_path)
-        self.cursor = self.connection.cursor()
-
-        self.connection.execute("PRAGMA foreign_keys = ON")
-
-        self.cursor.execute(
-            "CREATE TABLE IF NOT EXISTS "
-            "exchanges(slug TEXT PRIMARY KEY, name TEXT) STRICT",
-        )
-        self.cursor.execute(
+# Every entry upgrades the schema by one version, see migrate()
+_migrations = [
+    [
+        "CREATE TABLE IF NOT EXISTS exchanges(slug TEXT PRIMARY KEY, name TEXT) STRICT",
+        (
             "CREATE TABLE IF NOT EXISTS "
             "participants(uuid TEXT PRIMARY KEY, "
             "exchange_slug TEXT, "
             "FOREIGN KEY (exchange_slug) REFERENCES exchanges (slug)"
-            ") STRICT",
-        )
-        self.cursor.execute(
+            ") STRICT"
+        ),
+        (
             "CREATE TABLE IF NOT EXISTS "
             "participant_names(participant_id TEXT, "
             "name TEXT, "
@@ -43,9 +36,9 @@ class DatabaseHandler:
             "FOREIGN KEY (exchange_slug) REFERENCES exchanges (slug), "
             "FOREIGN KEY (participant_id) REFERENCES participants (uuid), "
             "UNIQUE (name, exchange_slug)"
-            ") STRICT",
-        )
-        self.cursor.execute(
+            ") STRICT"
+        ),
+        (
             "CREATE TABLE IF NOT EXISTS "
             "matches(exchange_slug TEXT, "
             "giver_id TEXT, "
@@ -53,9 +46,9 @@ class DatabaseHandler:
             "FOREIGN KEY (exchange_slug) REFERENCES exchanges (slug), "
             "FOREIGN KEY (giver_id) REFERENCES participants (uuid), "
             "FOREIGN KEY (giftee_id) REFERENCES participants (uuid)"
-            ") STRICT",
-        )
-        self.cursor.execute(
+            ") STRICT"
+        ),
+        (
             "CREATE TABLE IF NOT EXISTS "
             "constraints(giver_id TEXT, "
             "giftee_id TEXT, "
@@ -64,13 +57,296 @@ class DatabaseHandler:
             "FOREIGN KEY (exchange_slug) REFERENCES exchanges (slug), "
             "FOREIGN KEY (giver_id) REFERENCES participants (uuid), "
             "FOREIGN KEY (giftee_id) REFERENCES participants (uuid)"
-            ") STRICT",
-        )
-        self.connection.commit()
+            ") STRICT"
+        ),
+    ],
+    [
+        (
+            "CREATE INDEX IF NOT EXISTS participants_exchange_slug "
+            "ON participants (exchange_slug)"
+        ),
+        (
+            "CREATE INDEX IF NOT EXISTS participant_names_participant_id "
+            "ON participant_names (participant_id, active, name)"
+        ),
+        "CREATE INDEX IF NOT EXISTS matches_exchange_slug ON matches (exchange_slug)",
+        (
+            "CREATE INDEX IF NOT EXISTS matches_giver_id "
+            "ON matches (giver_id, giftee_id)"
+        ),
+        (
+            "CREATE INDEX IF NOT EXISTS matches_giftee_id "
+            "ON matches (giftee_id, giver_id)"
+        ),
+        (
+            "CREATE INDEX IF NOT EXISTS constraints_exchange_slug "
+            "ON constraints (exchange_slug)"
+        ),
+    ],
+    [
+        # Goes up with every change, so cached copies can be validated
+        "ALTER TABLE exchanges ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+    ],
+]
+
+
+class ConnectionProfile:
+    """Settings applied to every new connection to the database."""
+
+    journal_modes = ["delete", "truncate", "persist", "memory", "wal", "off"]
+    synchronous_levels = ["off", "normal", "full", "extra"]
+
+    def __init__(
+        self,
+        journal_mode: str = "wal",
+        synchronous: str = "normal",
+        busy_timeout: int = 5000,
+        mmap_size: int = 64 * 1024 * 1024,
+        cache_size: int = -16000,
+        write_retries: int = 5,
+        retry_backoff: float = 0.05,
+    ):
+        """Settings applied to every new connection to the database.
+
+        In WAL mode, readers are not blocked by a writer, so writing an exchange
+        does not stall everyone looking at their results.
+
+        Args:
+            journal_mode (str, optional): SQLite journal mode. Defaults to "wal".
+            synchronous (str, optional): SQLite synchronous level.
+                Defaults to "normal", which is safe in WAL mode.
+            busy_timeout (int, optional): Milliseconds to wait for a lock.
+                Defaults to 5000.
+            mmap_size (int, optional): Bytes of the database to memory-map.
+                Defaults to 64 MiB.
+            cache_size (int, optional): Page cache size, in pages if positive or
+                in KiB if negative. Defaults to -16000, about 16 MB.
+            write_retries (int, optional): How often to retry a write that failed
+                because the database was locked. Defaults to 5.
+            retry_backoff (float, optional): Seconds to wait before the first
+                retry, doubled for each further retry. Defaults to 0.05.
+
+        Raises:
+            ValueError: If the journal mode or synchronous level is unknown
+
+        """
+        if journal_mode.lower() not in self.journal_modes:
+            raise ValueError(f"Unknown journal mode '{journal_mode}'!")
+        if synchronous.lower() not in self.synchronous_levels:
+            raise ValueError(f"Unknown synchronous level '{synchronous}'!")
+        self.journal_mode = journal_mode.lower()
+        self.synchronous = synchronous.lower()
+        self.busy_timeout = int(busy_timeout)
+        self.mmap_size = int(mmap_size)
+        self.cache_size = int(cache_size)
+        self.write_retries = write_retries
+        self.retry_backoff = retry_backoff
+
+    def apply(self, connection: sqlite3.Connection) -> None:
+        """Apply the settings to a connection.
+
+        Args:
+            connection (sqlite3.Connection): Connection to configure
+
+        """
+        connection.execute(f"PRAGMA busy_timeout = {self.busy_timeout}")
+        connection.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        connection.execute(f"PRAGMA synchronous = {self.synchronous}")
+        connection.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        connection.execute(f"PRAGMA cache_size = {self.cache_size}")
+
+
+def connect(
+    db_path: str,
+    profile: ConnectionProfile | None = None,
+) -> sqlite3.Connection:
+    """Open a connection to the database.
+
+    Args:
+        db_path (str): Path to SQLite database
+        profile (ConnectionProfile, optional): Settings for the connection.
+            Defaults to None, for the default settings.
+
+    Returns:
+        sqlite3.Connection: The connection
+
+    """
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA foreign_keys = ON")
+    (profile or ConnectionProfile()).apply(connection)
+    return connection
+
+
+def _is_locked_error(error: sqlite3.OperationalError) -> bool:
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def _retry_when_locked(method: Callable) -> Callable:
+    """Retry a writing DatabaseHandler method while the database is locked.
+
+    Waits with exponential backoff and some jitter between attempts, as
+    configured in the connection profile of the handler.
+
+    Args:
+        method (Callable): Method to wrap
+
+    Returns:
+        Callable: Wrapped method
+
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: DatabaseHandler, *args: object, **kwargs: object) -> object:
+        for attempt in range(self.profile.write_retries + 1):
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not _is_locked_error(e) or attempt == self.profile.write_retries:
+                    raise
+                backoff = self.profile.retry_backoff * 2**attempt
+                time.sleep(backoff * random.uniform(0.5, 1.5))
+        return None  # not reached, the last attempt either returns or raises
+
+    return wrapper
+
+
+def migrate(connection: sqlite3.Connection) -> None:
+    """Bring the schema of a database up to date.
+
+    The current schema version is stored in the user_version of the database,
+    so only migrations that have not run yet are applied.
+
+    Args:
+        connection (sqlite3.Connection): Connection to the database
+
+    """
+    with connection:
+        # Keeps concurrently starting app instances from migrating twice, the
+        # version is only read once the write lock is held
+        connection.execute("BEGIN IMMEDIATE")
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        for new_version, statements in enumerate(
+            _migrations[version:],
+            start=version + 1,
+        ):
+            for statement in statements:
+                connection.execute(statement)
+            connection.execute(f"PRAGMA user_version = {new_version}")
+
+
+class ConnectionPool:
+    """Reusable connections to one database, kept separately for every thread."""
+
+    def __init__(
+        self,
+        db_path: str = "db.sqlite",
+        profile: ConnectionProfile | None = None,
+    ):
+        """Reusable connections to one database.
+
+        Migrates the database once, so connections taken from the pool can be
+        used right away.
+
+        Args:
+            db_path (str, optional): Path to SQLite database. Defaults to "db.sqlite".
+            profile (ConnectionProfile, optional): Settings for new connections.
+                Defaults to None, for the default settings.
+
+        """
+        self.db_path = db_path
+        self.profile = profile or ConnectionProfile()
+        self._local = threading.local()
+        with closing(connect(self.db_path, self.profile)) as connection:
+            migrate(connection)
+
+    def _idle_connections(self) -> list[sqlite3.Connection]:
+        if not hasattr(self._local, "connections"):
+            self._local.connections = []
+        return self._local.connections
+
+    def acquire(self) -> sqlite3.Connection:
+        """Borrow a connection, opening a new one if this thread has none left.
+
+        Returns:
+            sqlite3.Connection: The connection
+
+        """
+        idle_connections = self._idle_connections()
+        if idle_connections:
+            return idle_connections.pop()
+        return connect(self.db_path, self.profile)
+
+    def release(self, connection: sqlite3.Connection) -> None:
+        """Return a borrowed connection to the pool.
+
+        Anything not committed yet is rolled back.
+
+        Args:
+            connection (sqlite3.Connection): The connection to return
+
+        """
+        connection.rollback()
+        self._idle_connections().append(connection)
+
+    def close(self) -> None:
+        """Close the idle connections of this thread."""
+        idle_connections = self._idle_connections()
+        while idle_connections:
+            idle_connections.pop().close()
+
+
+class DatabaseHandler(StorageBackend):
+    """Manages communication with the SQLite database."""
+
+    IntegrityError = sqlite3.IntegrityError
+
+    def __init__(
+        self,
+        db_path: str = "db.sqlite",
+        pool: ConnectionPool | None = None,
+        profile: ConnectionProfile | None = None,
+        observer: Callable[[str, Any, float], None] | None = None,
+        profiler: QueryProfiler | None = None,
+    ):
+        """Manages communication with the database.
+
+        Args:
+            db_path (str, optional): Path to SQLite database. Defaults to "db.sqlite".
+                Ignored if a pool is given.
+            pool (ConnectionPool, optional): Pool to borrow the connection from.
+                Defaults to None, to open and migrate a database of its own.
+            profile (ConnectionProfile, optional): Settings for the connection.
+                Ignored if a pool is given. Defaults to None, for the default settings.
+            observer (Callable[[str, Any, float], None], optional): Called with
+                every statement, its parameters and the seconds it took.
+                Defaults to None.
+            profiler (QueryProfiler, optional): Profiler to report every
+                statement to. Defaults to None.
+
+        """
+        self.pool = pool
+        if self.pool is None:
+            self.db_path = db_path
+            self.profile = profile or ConnectionProfile()
+            self.connection = connect(self.db_path, self.profile)
+            migrate(self.connection)
+        else:
+            self.db_path = self.pool.db_path
+            self.profile = self.pool.profile
+            self.connection = self.pool.acquire()
+        observers = [observer]
+        if profiler is not None:
+            observers.append(profiler.observer(self.connection, "EXPLAIN QUERY PLAN"))
+        self.cursor = observe_cursor(self.connection.cursor(), *observers)
 
     def close_connection(self) -> None:
-        """Close the connection to the database."""
-        self.connection.close()
+        """Close the connection to the database, or return it to the pool."""
+        self.cursor.close()
+        if self.pool is None:
+            self.connection.close()
+        else:
+            self.pool.release(self.connection)
 
     def exchange_exists(self, slug: str) -> bool:
         """Whether an exchange with the given slug exists in the database.
@@ -85,6 +361,22 @@ class DatabaseHandler:
         res = self.cursor.execute("SELECT 1 FROM exchanges WHERE slug = ?", (slug,))
         return res.fetchone() is not None
 
+    def get_exchange_version(self, slug: str) -> int:
+        """Get the version of an exchange, which goes up whenever it changes.
+
+        Args:
+            slug (str): Slug of the exchange
+
+        Returns:
+            int: Version of the exchange, or 0 if it does not exist
+
+        """
+        res = self.cursor.execute(
+            "SELECT version FROM exchanges WHERE slug = ?",
+            (slug,),
+        ).fetchone()
+        return 0 if res is None else res[0]
+
     def participant_name_available(
         self,
         exchange_slug: str,
@@ -114,6 +406,56 @@ class DatabaseHandler:
         )
         return res.fetchone() is None
 
+    def names_available(
+        self,
+        exchange_slugs: list[str],
+        exchange_slug: str,
+        names: list[str],
+        old_name: str = "",
+    ) -> tuple[dict[str, bool], dict[str, bool]]:
+        """Check the availability of many exchange slugs and participant names at once.
+
+        Args:
+            exchange_slugs (list[str]): Exchange slugs to check
+            exchange_slug (str): Slug of the exchange to check participant names in
+            names (list[str]): Participant names to check
+            old_name (str, optional): Current name of the participant to exclude
+                from search. Defaults to "", to exclude no one.
+
+        Returns:
+            tuple[dict[str, bool], dict[str, bool]]: Whether each exchange slug and
+            whether each participant name is available
+
+        """
+        queries = []
+        parameters = []
+        if exchange_slugs:
+            queries.append(
+                "SELECT 'exchange', slug FROM exchanges "
+                f"WHERE slug IN ({', '.join('?' * len(exchange_slugs))})",
+            )
+            parameters += exchange_slugs
+        if names:
+            queries.append(
+                "SELECT 'participant', name FROM participant_names "
+                "WHERE exchange_slug = ? "
+                f"AND name IN ({', '.join('?' * len(names))}) "
+                "AND participant_id IS NOT ("
+                "SELECT participant_id FROM participant_names "
+                "WHERE exchange_slug = ? AND name = ?"
+                ")",
+            )
+            parameters += [exchange_slug, *names, exchange_slug, old_name]
+        taken = set()
+        if queries:
+            # Only placeholders are formatted into the query, never values
+            res = self.cursor.execute(" UNION ALL ".join(queries), parameters)
+            taken = set(res.fetchall())
+        return (
+            {slug: ("exchange", slug) not in taken for slug in exchange_slugs},
+            {name: ("participant", name) not in taken for name in names},
+        )
+
     def get_exchange_name(self, slug: str) -> str:
         """Get the name of an exchange for a given slug.
 
@@ -132,6 +474,7 @@ class DatabaseHandler:
         res = self.cursor.execute("SELECT name FROM exchanges WHERE slug = ?", (slug,))
         return res.fetchone()[0]
 
+    @_retry_when_locked
     def create_exchange(
         self,
         exchange: Exchange,
@@ -147,49 +490,51 @@ class DatabaseHandler:
             constraints (list[Constraint]): The constraints of this exchange
             pairing (list[Match]): The pairing to create
 
+        Raises:
+            IntegrityError: If the exchange or one of the names already exists.
+                Nothing is written in that case.
+
         """
-        self.cursor.execute(
-            "INSERT INTO exchanges VALUES (?, ?)",
-            (exchange.slug, exchange.name),
-        )
-        for participant in participants:
+        participant_rows = [(str(p.uuid), exchange.slug) for p in participants]
+        name_rows = [
+            (str(p.uuid), name, int(i == p.active_name), exchange.slug)
+            for p in participants
+            for i, name in enumerate(p.names)
+        ]
+        constraint_rows = [
+            (
+                str(c.giver_id),
+                str(c.giftee_id),
+                exchange.slug,
+                c.probability_level,
+            )
+            for c in constraints
+        ]
+        match_rows = [
+            (exchange.slug, str(m.giver_id), str(m.giftee_id)) for m in pairing
+        ]
+        # Commits if everything was inserted, rolls back everything otherwise
+        with self.connection:
             self.cursor.execute(
+                "INSERT INTO exchanges (slug, name) VALUES (?, ?)",
+                (exchange.slug, exchange.name),
+            )
+            self.cursor.executemany(
                 "INSERT INTO participants VALUES (?, ?)",
-                (
-                    str(participant.uuid),
-                    exchange.slug,
-                ),
+                participant_rows,
             )
-            for i, name in enumerate(participant.names):
-                self.cursor.execute(
-                    "INSERT INTO participant_names VALUES (?, ?, ?, ?)",
-                    (
-                        str(participant.uuid),
-                        name,
-                        int(i == participant.active_name),
-                        exchange.slug,
-                    ),
-                )
-        for constraint in constraints:
-            self.cursor.execute(
+            self.cursor.executemany(
+                "INSERT INTO participant_names VALUES (?, ?, ?, ?)",
+                name_rows,
+            )
+            self.cursor.executemany(
                 "INSERT INTO constraints VALUES (?, ?, ?, ?)",
-                (
-                    str(constraint.giver_id),
-                    str(constraint.giftee_id),
-                    exchange.slug,
-                    constraint.probability_level,
-                ),
+                constraint_rows,
             )
-        for match in pairing:
-            self.cursor.execute(
+            self.cursor.executemany(
                 "INSERT INTO matches VALUES (?, ?, ?)",
-                (
-                    exchange.slug,
-                    str(match.giver_id),
-                    str(match.giftee_id),
-                ),
+                match_rows,
             )
-        self.connection.commit()
 
     def get_exchange(
         self,
@@ -207,57 +552,56 @@ class DatabaseHandler:
             Exchange: The exchange object from the database
 
         """
-        if not self.exchange_exists(slug):
+        result = self.cursor.execute(
+            "SELECT name FROM exchanges WHERE slug = ?",
+            (slug,),
+        ).fetchone()
+        if result is None:
             raise ValueError(f"There is no exchange with slug '{slug}'!")
+        exchange_name = result[0]
+
         result = self.cursor.execute(
-            "SELECT * FROM participants WHERE exchange_slug = ?",
+            "SELECT p.uuid, n.name, n.active "
+            "FROM participants AS p "
+            "JOIN participant_names AS n "
+            "ON n.participant_id = p.uuid "
+            "WHERE p.exchange_slug = ? "
+            "ORDER BY p.rowid, n.rowid",
             (slug,),
         )
-        participants = []
-        for r in result.fetchall():
-            uuid, _exchange = r
-            result_participant_names = self.cursor.execute(
-                "SELECT name, active FROM participant_names WHERE participant_id = ?",
-                (str(uuid),),
-            )
-            participant_names = []
-            for participant_name, active in result_participant_names.fetchall():
-                participant_names.append(participant_name)
-                if active:
-                    active_name = len(participant_names) - 1
-            participants.append(
-                Participant(
-                    names=participant_names,
-                    active_name=active_name,
-                    uuid=UUID(uuid),
-                ),
-            )
+        participants_by_id = {}
+        for uuid, participant_name, active in result.fetchall():
+            if uuid not in participants_by_id:
+                participants_by_id[uuid] = Participant(names=[], uuid=UUID(uuid))
+            participant = participants_by_id[uuid]
+            participant.names.append(participant_name)
+            if active:
+                participant.active_name = len(participant.names) - 1
+        participants = list(participants_by_id.values())
+
+        def get_uuid(participant_id: str) -> UUID:
+            if participant_id in participants_by_id:
+                return participants_by_id[participant_id].uuid
+            return UUID(participant_id)
 
         result = self.cursor.execute(
-            "SELECT * FROM constraints WHERE exchange_slug = ?",
+            "SELECT giver_id, giftee_id, probability_level "
+            "FROM constraints WHERE exchange_slug = ?",
             (slug,),
         )
-        constraints = []
-        for r in result.fetchall():
-            giver_id, giftee_id, exchange_slug, probability_level = r
-            constraints.append(
-                Constraint(
-                    UUID(giver_id),
-                    UUID(giftee_id),
-                    probability_level,
-                ),
-            )
+        constraints = [
+            Constraint(get_uuid(giver_id), get_uuid(giftee_id), probability_level)
+            for giver_id, giftee_id, probability_level in result.fetchall()
+        ]
 
         result = self.cursor.execute(
-            "SELECT * FROM matches WHERE exchange_slug = ?",
+            "SELECT giver_id, giftee_id FROM matches WHERE exchange_slug = ?",
             (slug,),
         )
-        pairing = []
-        for r in result.fetchall():
-            exchange_slug, giver_uuid, giftee_uuid = r
-            pairing.append(Match(UUID(giver_uuid), UUID(giftee_uuid)))
-
-        exchange_name = self.get_exchange_name(exchange_slug)
+        pairing = [
+            Match(get_uuid(giver_id), get_uuid(giftee_id))
+            for giver_id, giftee_id in result.fetchall()
+        ]
 
         return Exchange(exchange_name, participants, constraints, pairing)
 
@@ -288,9 +632,10 @@ class DatabaseHandler:
         return Participant(
             names=participant_names,
             active_name=active_name,
-            uuid=UUID(participant_id),
+            uuid=UUID(str(participant_id)),
         )
 
+    @_retry_when_locked
     def change_participant_name(
         self,
         exchange_slug: str,
@@ -308,44 +653,48 @@ class DatabaseHandler:
             ValueError: If there is no participant with the given name in the exchange
 
         """
-        res_id = self.cursor.execute(
-            "SELECT participant_id FROM participant_names "
-            "WHERE name = ? AND exchange_slug = ?",
-            (old_name, exchange_slug),
-        )
-        try:
-            participant_id = res_id.fetchone()[0]
-        except TypeError:
-            raise ValueError(f"There is no participant with name '{old_name}'!")
-        self.cursor.execute(
-            "UPDATE participant_names SET active = 0 "
-            "WHERE participant_id = ? AND name = ?",
-            (participant_id, old_name),
-        )
-        res_name_exists = self.cursor.execute(
-            "SELECT * FROM participant_names WHERE participant_id = ? AND name = ?",
-            (participant_id, new_name),
-        )
-        name_exists = bool(res_name_exists.fetchone())
-        if name_exists:
-            # Don't add a new name, just set the existing new_name to active
+        with self.connection:
+            res_id = self.cursor.execute(
+                "SELECT participant_id FROM participant_names "
+                "WHERE name = ? AND exchange_slug = ?",
+                (old_name, exchange_slug),
+            )
+            try:
+                participant_id = res_id.fetchone()[0]
+            except TypeError:
+                raise ValueError(f"There is no participant with name '{old_name}'!")
             self.cursor.execute(
-                "UPDATE participant_names SET active = 1 "
+                "UPDATE participant_names SET active = 0 "
                 "WHERE participant_id = ? AND name = ?",
+                (participant_id, old_name),
+            )
+            res_name_exists = self.cursor.execute(
+                "SELECT * FROM participant_names WHERE participant_id = ? AND name = ?",
                 (participant_id, new_name),
             )
-        else:
-            # Add a new name
+            name_exists = bool(res_name_exists.fetchone())
+            if name_exists:
+                # Don't add a new name, just set the existing new_name to active
+                self.cursor.execute(
+                    "UPDATE participant_names SET active = 1 "
+                    "WHERE participant_id = ? AND name = ?",
+                    (participant_id, new_name),
+                )
+            else:
+                # Add a new name
+                self.cursor.execute(
+                    "INSERT INTO participant_names VALUES (?, ?, ?, ?)",
+                    (
+                        str(participant_id),
+                        new_name,
+                        1,
+                        exchange_slug,
+                    ),
+                )
             self.cursor.execute(
-                "INSERT INTO participant_names VALUES (?, ?, ?, ?)",
-                (
-                    str(participant_id),
-                    new_name,
-                    1,
-                    exchange_slug,
-                ),
+                "UPDATE exchanges SET version = version + 1 WHERE slug = ?",
+                (exchange_slug,),
             )
-        self.connection.commit()
 
     def get_active_name(self, exchange_slug: str, name: str) -> str:
         """Get up-to-date name of a participant that used to go by the given name.
@@ -379,6 +728,54 @@ class DatabaseHandler:
                 f"and participant name {name}!",
             )
 
+    def get_participant_result(
+        self,
+        exchange_slug: str,
+        name: str,
+    ) -> tuple[str, str, str, str]:
+        """Get everything needed to show a participant their result, in one query.
+
+        Args:
+            exchange_slug (str): Slug of the exchange to search in
+            name (str): current or old name of the participant
+
+        Raises:
+            ValueError: If there is no participant with that name in the exchange
+
+        Returns:
+            tuple[str, str, str, str]: Name of the exchange, current name of the
+            participant, current name of their giftee and current name of their giver
+
+        """
+        result = self.cursor.execute(
+            "SELECT e.name, active_name.name, giftee_name.name, giver_name.name "
+            "FROM participant_names AS n "
+            "JOIN exchanges AS e "
+            "ON e.slug = n.exchange_slug "
+            "JOIN participant_names AS active_name "
+            "ON active_name.participant_id = n.participant_id "
+            "AND active_name.active = 1 "
+            "JOIN matches AS giftee_match "
+            "ON giftee_match.giver_id = n.participant_id "
+            "JOIN participant_names AS giftee_name "
+            "ON giftee_name.participant_id = giftee_match.giftee_id "
+            "AND giftee_name.active = 1 "
+            "JOIN matches AS giver_match "
+            "ON giver_match.giftee_id = n.participant_id "
+            "JOIN participant_names AS giver_name "
+            "ON giver_name.participant_id = giver_match.giver_id "
+            "AND giver_name.active = 1 "
+            "WHERE n.exchange_slug = ? "
+            "AND n.name = ?",
+            (exchange_slug, name),
+        ).fetchone()
+        if result is None:
+            raise ValueError(
+                f"There is no participant with name '{name}' "
+                f"in exchange '{exchange_slug}'!",
+            )
+        return result
+
     def get_giftee_for_giver(self, exchange_slug: str, giver_name: str) -> Participant:
         """Get the participant a given participant will get a gift for.
 
@@ -1,12 +1,22 @@
 from constraint import Constraint
-from match import Match
-from participant import Participant
+from match import Match, PairingIndex
+from participant import Participant, ParticipantRegistry
 from utils import slugify
 
 
 class Exchange:
     """All the data for one gift exchange."""
 
+    __slots__ = (
+        "_pairing_index",
+        "_participant_registry",
+        "constraints",
+        "name",
+        "pairing",
+        "participants",
+        "slug",
+    )
+
     def __init__(
         self,
         name: str,
@@ -33,3 +43,35 @@ class Exchange:
         self.participants = participants
         self.constraints = constraints
         self.pairing = pairing
+        # Only built when needed, most exchanges are just stored or listed
+        self._participant_registry = None
+        self._pairing_index = None
+
+    @property
+    def participant_registry(self) -> ParticipantRegistry:
+        """Participants indexed by id and name, built on first access.
+
+        The participants must not be added or renamed except through the
+        registry afterwards, or it gets out of date.
+
+        Returns:
+            ParticipantRegistry: Index of the participants
+
+        """
+        if self._participant_registry is None:
+            self._participant_registry = ParticipantRegistry(self.participants)
+        return self._participant_registry
+
+    @property
+    def pairing_index(self) -> PairingIndex:
+        """Pairing indexed by giver and giftee, built on first access.
+
+        The pairing must not change afterwards, or the index gets out of date.
+
+        Returns:
+            PairingIndex: Index of the pairing
+
+        """
+        if self._pairing_index is None:
+            self._pairing_index = PairingIndex(self.pairing)
+        return self._pairing_index
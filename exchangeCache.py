@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from exchange import Exchange
+    from storage import StorageBackend
+
+
+class ExchangeCache:
+    """Bounded in-process cache of exchanges loaded from the database.
+
+    Pairings and constraints never change once an exchange is created, so
+    only renaming participants needs to invalidate an entry. Entries are
+    checked against the version of the exchange in the database, so changes
+    made by other processes serving the same database are picked up too.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """Bounded cache of exchanges, dropping the least recently used first.
+
+        Args:
+            maxsize (int, optional): Number of exchanges to keep. Defaults to 256.
+
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._exchanges = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_exchange(
+        self,
+        db: StorageBackend,
+        slug: str,
+        version: int | None = None,
+    ) -> Exchange:
+        """Get exchange by it's slug, loading it from the database if necessary.
+
+        Costs a single query while the cached copy is up to date.
+
+        Args:
+            db (StorageBackend): Database to load the exchange from
+            slug (str): slug of the exchange to get
+            version (int, optional): Current version of the exchange, if the caller
+                just read it. Defaults to None, to read it from the database.
+
+        Raises:
+            ValueError: If the exchange does not exist
+
+        Returns:
+            Exchange: The exchange. Must not be modified.
+
+        """
+        # Read before loading, so a change in between can't be missed
+        if version is None:
+            version = db.get_exchange_version(slug)
+        with self._lock:
+            if slug in self._exchanges:
+                cached_version, exchange = self._exchanges[slug]
+                if cached_version == version:
+                    self.hits += 1
+                    self._exchanges.move_to_end(slug)
+                    return exchange
+            self.misses += 1
+        exchange = db.get_exchange(slug)
+        with self._lock:
+            self._exchanges[slug] = (version, exchange)
+            self._exchanges.move_to_end(slug)
+            while len(self._exchanges) > self.maxsize:
+                self._exchanges.popitem(last=False)
+        return exchange
+
+    def invalidate(self, slug: str) -> None:
+        """Drop an exchange from the cache, after it was changed in the database.
+
+        Args:
+            slug (str): slug of the exchange that changed
+
+        """
+        with self._lock:
+            self._exchanges.pop(slug, None)
+
+    def clear(self) -> None:
+        """Drop all exchanges and reset the counters."""
+        with self._lock:
+            self._exchanges.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._exchanges)
@@ -0,0 +1,507 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+# Upper bounds of the request duration histogram, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_PREFIX = "secret_gift_swap_"
+
+logger = logging.getLogger(__name__)
+
+# Strings, numbers and placeholders of SQLite and psycopg
+_literal = re.compile(r"'(?:[^']|'')*'|%s|\$\d+|\b\d+(?:\.\d+)?\b")
+_value_list = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+# Statements the query planner can explain, by their first keyword
+_explainable = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+
+# Counters summed up per endpoint: metric name, RequestMetrics attribute, help
+_TOTALS = [
+    ("sql_statements_total", "sql_statements", "SQL statements executed."),
+    (
+        "sql_duration_seconds_total",
+        "sql_seconds",
+        "Time spent executing SQL statements.",
+    ),
+    (
+        "render_duration_seconds_total",
+        "render_seconds",
+        "Time spent rendering templates.",
+    ),
+    (
+        "pairing_attempts_total",
+        "pairing_attempts",
+        "Pairings tried by the pairing solver.",
+    ),
+    (
+        "pairing_duration_seconds_total",
+        "pairing_seconds",
+        "Time spent generating pairings.",
+    ),
+]
+
+
+class ObservedCursor:
+    """Database cursor that reports every statement and how long it took."""
+
+    def __init__(
+        self,
+        cursor: Any,  # noqa: ANN401 any DB-API cursor
+        observers: list[Callable[[str, Any, float], None]],
+    ):
+        """Wrap a cursor, reporting statements to observers.
+
+        Args:
+            cursor (Any): The cursor to wrap, eg a sqlite3.Cursor
+            observers (list[Callable[[str, Any, float], None]]): Called with the
+                statement, its parameters and the seconds it took, after each
+                successful execute or executemany. For executemany, only the
+                first set of parameters is passed.
+
+        """
+        self._cursor = cursor
+        self._observers = observers
+
+    def _report(self, statement: str, parameters: Any, seconds: float) -> None:  # noqa: ANN401
+        for observer in self._observers:
+            observer(statement, parameters, seconds)
+
+    def execute(self, statement: str, parameters: Any = ()) -> ObservedCursor:  # noqa: ANN401
+        """Execute a statement.
+
+        Args:
+            statement (str): The SQL statement
+            parameters (Any, optional): Its parameters. Defaults to ().
+
+        Returns:
+            ObservedCursor: This cursor, to fetch results from
+
+        """
+        start = time.perf_counter()
+        self._cursor.execute(statement, parameters)
+        self._report(statement, parameters, time.perf_counter() - start)
+        return self
+
+    def executemany(
+        self,
+        statement: str,
+        parameters: Iterable[Any],
+    ) -> ObservedCursor:
+        """Execute a statement once for every set of parameters.
+
+        Args:
+            statement (str): The SQL statement
+            parameters (Iterable[Any]): One set of parameters per execution
+
+        Returns:
+            ObservedCursor: This cursor
+
+        """
+        parameters = list(parameters)
+        start = time.perf_counter()
+        self._cursor.executemany(statement, parameters)
+        if parameters:  # Otherwise nothing was executed
+            self._report(statement, parameters[0], time.perf_counter() - start)
+        return self
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._cursor)
+
+    def __getattr__(self, name: str) -> Any:  # noqa: ANN401
+        return getattr(self._cursor, name)
+
+
+def observe_cursor(
+    cursor: Any,  # noqa: ANN401 any DB-API cursor
+    *observers: Callable[[str, Any, float], None] | None,
+) -> Any:  # noqa: ANN401
+    """Wrap a cursor in an ObservedCursor, if there is someone to observe it.
+
+    Args:
+        cursor (Any): The cursor to wrap
+        *observers (Callable[[str, Any, float], None] | None): Called after
+            every statement. None is skipped.
+
+    Returns:
+        Any: The wrapped cursor, or the cursor itself if there are no observers
+
+    """
+    observers = [observer for observer in observers if observer is not None]
+    if not observers:
+        return cursor
+    return ObservedCursor(cursor, observers)
+
+
+def normalize_query(statement: str) -> str:
+    """Reduce a statement to its shape, so statements differing in values match.
+
+    Literals and placeholders become "?", lists of them collapse into one, and
+    whitespace is collapsed.
+
+    Args:
+        statement (str): The SQL statement
+
+    Returns:
+        str: The normalized statement
+
+    """
+    query = _literal.sub("?", statement)
+    query = _value_list.sub("(?)", query)
+    return " ".join(query.split())
+
+
+class QueryProfiler:
+    """Collects timings of every statement and the plans of slow ones.
+
+    Statements are counted by their normalized form. Statements taking longer
+    than the threshold are logged as warnings of the logger of this module,
+    together with their query plan, but without parameters, as those contain
+    names of participants.
+    """
+
+    def __init__(self, threshold: float = 0.05):
+        """Start profiling.
+
+        Args:
+            threshold (float, optional): Seconds after which a statement is slow.
+                Defaults to 0.05.
+
+        """
+        self.threshold = threshold
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def observer(
+        self,
+        connection: Any,  # noqa: ANN401 any DB-API connection
+        explain: str,
+    ) -> Callable[[str, Any, float], None]:
+        """Get an observer for the cursor of a database handler.
+
+        Args:
+            connection (Any): Connection of the cursor, to explain slow
+                statements with
+            explain (str): Prefix that makes a statement return its query plan,
+                eg "EXPLAIN QUERY PLAN" for SQLite
+
+        Returns:
+            Callable[[str, Any, float], None]: The observer
+
+        """
+
+        def observe(statement: str, parameters: Any, seconds: float) -> None:  # noqa: ANN401
+            plan = None
+            keyword = statement.split(None, 1)[0].upper() if statement.strip() else ""
+            if seconds > self.threshold and keyword in _explainable:
+                rows = connection.execute(f"{explain} {statement}", parameters)
+                plan = "\n".join(str(row[-1]) for row in rows.fetchall())
+            self.record(statement, seconds, plan)
+
+        return observe
+
+    def record(self, statement: str, seconds: float, plan: str | None = None) -> None:
+        """Count a statement, and log it if it was slow.
+
+        Args:
+            statement (str): The SQL statement
+            seconds (float): How long it took
+            plan (str | None, optional): Its query plan. Defaults to None.
+
+        """
+        query = normalize_query(statement)
+        slow = seconds > self.threshold
+        with self._lock:
+            statistics = self._queries.setdefault(
+                query,
+                {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "slow_calls": 0},
+            )
+            statistics["calls"] += 1
+            statistics["seconds"] += seconds
+            statistics["max_seconds"] = max(statistics["max_seconds"], seconds)
+            if slow:
+                statistics["slow_calls"] += 1
+            if plan is not None:
+                statistics["plan"] = plan
+        if slow:
+            logger.warning(
+                "Slow query (%.1f ms): %s\n%s",
+                seconds * 1000,
+                query,
+                plan or "(no plan)",
+            )
+
+    def queries(self) -> list[dict]:
+        """Get the statistics of every normalized statement.
+
+        Returns:
+            list[dict]: Query, number of calls, total, maximum and number of
+            slow calls, and the last plan if it was ever slow, most total time
+            first
+
+        """
+        with self._lock:
+            queries = [
+                {"query": query, **statistics}
+                for query, statistics in self._queries.items()
+            ]
+        return sorted(queries, key=lambda q: q["seconds"], reverse=True)
+
+    def clear(self) -> None:
+        """Forget all statements."""
+        with self._lock:
+            self._queries.clear()
+
+
+class RequestMetrics:
+    """Where the time of one request went."""
+
+    def __init__(self):
+        """Start measuring a request."""
+        self.start = time.perf_counter()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        self.pairing_attempts = 0
+        self.pairing_seconds = 0.0
+        self._render_starts = []
+
+    def record_statement(
+        self,
+        _statement: str,
+        _parameters: Any,  # noqa: ANN401
+        seconds: float,
+    ) -> None:
+        """Count an SQL statement, for use as observer of a database handler.
+
+        Args:
+            _statement (str): The SQL statement
+            _parameters (Any): Its parameters
+            seconds (float): How long it took
+
+        """
+        self.sql_statements += 1
+        self.sql_seconds += seconds
+
+    def render_started(self) -> None:
+        """Note that a template started rendering."""
+        self._render_starts.append(time.perf_counter())
+
+    def render_finished(self) -> None:
+        """Note that the template rendered last finished rendering."""
+        if self._render_starts:
+            self.render_seconds += time.perf_counter() - self._render_starts.pop()
+
+    def record_pairing(self, attempts: int, seconds: float) -> None:
+        """Count the work of a pairing solver.
+
+        Args:
+            attempts (int): How many pairings the solver tried
+            seconds (float): How long it took
+
+        """
+        self.pairing_attempts += attempts
+        self.pairing_seconds += seconds
+
+    def elapsed(self) -> float:
+        """Get the time since the request started.
+
+        Returns:
+            float: Seconds since the request started
+
+        """
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total_seconds: float) -> str:
+        """Format the metrics as value of a Server-Timing header.
+
+        Args:
+            total_seconds (float): Wall time of the whole request
+
+        Returns:
+            str: The header value, with durations in milliseconds
+
+        """
+        timings = [
+            f"total;dur={total_seconds * 1000:.2f}",
+            (
+                f"db;dur={self.sql_seconds * 1000:.2f};"
+                f'desc="{self.sql_statements} queries"'
+            ),
+            f"render;dur={self.render_seconds * 1000:.2f}",
+        ]
+        if self.pairing_attempts:
+            timings.append(
+                f"pairing;dur={self.pairing_seconds * 1000:.2f};"
+                f'desc="{self.pairing_attempts} attempts"',
+            )
+        return ", ".join(timings)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in labels.values()
+    )
+    return (
+        "{"
+        + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped))
+        + "}"
+    )
+
+
+def format_metric(
+    name: str,
+    metric_type: str,
+    help_text: str,
+    samples: Iterable[tuple[dict[str, str], float]],
+) -> str:
+    """Format one metric in the Prometheus text format.
+
+    Args:
+        name (str): Name of the metric, without the common prefix
+        metric_type (str): "counter", "gauge" or "histogram"
+        help_text (str): Description of the metric
+        samples (Iterable[tuple[dict[str, str], float]]): Labels and value of
+            every sample. For histograms, names of the samples are taken from
+            a "__name__" label, so "_bucket", "_sum" and "_count" can be added.
+
+    Returns:
+        str: The metric, ending with a newline
+
+    """
+    name = METRIC_PREFIX + name
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        sample_labels = dict(labels)
+        suffix = sample_labels.pop("__name__", "")
+        lines.append(f"{name}{suffix}{_format_labels(sample_labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    """Counters of all requests served by this process."""
+
+    def __init__(self):
+        """Start with all counters at zero."""
+        self._lock = threading.Lock()
+        self.clear()
+
+    def record(
+        self,
+        endpoint: str,
+        method: str,
+        status: int,
+        request_metrics: RequestMetrics,
+        total_seconds: float,
+    ) -> None:
+        """Add a finished request to the counters.
+
+        Args:
+            endpoint (str): Flask endpoint that handled the request
+            method (str): HTTP method
+            status (int): Status code of the response
+            request_metrics (RequestMetrics): Metrics of the request
+            total_seconds (float): Wall time of the request
+
+        """
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            buckets, duration_sum, count = self._durations.get(
+                endpoint,
+                ([0] * len(DURATION_BUCKETS), 0.0, 0),
+            )
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if total_seconds <= bound:
+                    buckets[i] += 1
+            self._durations[endpoint] = (
+                buckets,
+                duration_sum + total_seconds,
+                count + 1,
+            )
+            totals = self._totals.setdefault(endpoint, {})
+            for _name, attribute, _help_text in _TOTALS:
+                totals[attribute] = totals.get(attribute, 0) + getattr(
+                    request_metrics,
+                    attribute,
+                )
+
+    def clear(self) -> None:
+        """Reset all counters."""
+        with self._lock:
+            self._requests = {}
+            self._durations = {}
+            self._totals = {}
+
+    def render(self) -> str:
+        """Format all counters in the Prometheus text format.
+
+        Returns:
+            str: The metrics
+
+        """
+        with self._lock:
+            requests = sorted(self._requests.items())
+            durations = sorted(
+                (endpoint, (list(buckets), duration_sum, count))
+                for endpoint, (buckets, duration_sum, count) in self._durations.items()
+            )
+            totals = sorted((e, dict(t)) for e, t in self._totals.items())
+
+        histogram = []
+        for endpoint, (buckets, duration_sum, count) in durations:
+            for bound, bucket in zip(DURATION_BUCKETS, buckets):
+                histogram.append(
+                    (
+                        {
+                            "__name__": "_bucket",
+                            "endpoint": endpoint,
+                            "le": f"{bound:g}",
+                        },
+                        bucket,
+                    ),
+                )
+            histogram.append(
+                ({"__name__": "_bucket", "endpoint": endpoint, "le": "+Inf"}, count),
+            )
+            histogram.append(({"__name__": "_sum", "endpoint": endpoint}, duration_sum))
+            histogram.append(({"__name__": "_count", "endpoint": endpoint}, count))
+
+        return "".join(
+            [
+                format_metric(
+                    "requests_total",
+                    "counter",
+                    "Requests served.",
+                    (
+                        ({"endpoint": e, "method": m, "status": s}, count)
+                        for (e, m, s), count in requests
+                    ),
+                ),
+                format_metric(
+                    "request_duration_seconds",
+                    "histogram",
+                    "Wall time of requests.",
+                    histogram,
+                ),
+            ]
+            + [
+                format_metric(
+                    name,
+                    "counter",
+                    help_text,
+                    (({"endpoint": e}, t[attribute]) for e, t in totals),
+                )
+                for name, attribute, help_text in _TOTALS
+            ],
+        )
@@ -7,7 +7,12 @@ if TYPE_CHECKING:
 
 
 class Match:
-    """Match of one giver to one giftee."""
+    """Match of one giver to one giftee.
+
+    Matches are hashable, so they must not be changed once created.
+    """
+
+    __slots__ = ("giftee_id", "giver_id")
 
     def __init__(self, giver_id: UUID, giftee_id: UUID):
         """Match one participant (giver) to another (giftee).
@@ -22,9 +27,12 @@ class Match:
 
     def __eq__(self, value: any):
         if isinstance(value, Match):
-            return self.giver_id == value.giver_id and self.giftee_id == value.giftee_id
+            return (self.giver_id, self.giftee_id) == (value.giver_id, value.giftee_id)
         return NotImplemented
 
+    def __hash__(self):
+        return hash((self.giver_id, self.giftee_id))
+
     def __str__(self):
         return f"{str(self.giver_id)}: {str(self.giftee_id)}"
 
@@ -32,21 +40,87 @@ class Match:
         return f"Match(giver={self.giver_id}, giftee={self.giftee_id})"
 
 
+class PairingIndex:
+    """Pairing of an exchange, indexed by giver and by giftee."""
+
+    def __init__(self, pairing: list[Match]):
+        """Index a pairing.
+
+        Args:
+            pairing (list[Match]): Pairing to index
+
+        """
+        self.pairing = pairing
+        self._giftee_by_giver = {m.giver_id: m.giftee_id for m in pairing}
+        self._giver_by_giftee = {m.giftee_id: m.giver_id for m in pairing}
+
+    def get_giftee_for_giver(self, giver_id: UUID) -> UUID | None:
+        """Get the giftee of a giver.
+
+        Args:
+            giver_id (UUID): Participant to get giftee for
+
+        Returns:
+            UUID|None: Giftee
+
+        """
+        return self._giftee_by_giver.get(giver_id)
+
+    def get_giver_for_giftee(self, giftee_id: UUID) -> UUID | None:
+        """Get the giver of a giftee.
+
+        Args:
+            giftee_id (UUID): Participant to get giver for
+
+        Returns:
+            UUID|None: Giver
+
+        """
+        return self._giver_by_giftee.get(giftee_id)
+
+    def __len__(self) -> int:
+        return len(self.pairing)
+
+
 def get_giftee_for_giver(
-    matching: list[Match],
+    matching: list[Match] | PairingIndex,
     giver_id: UUID,
 ) -> UUID | None:
     """Given a giver, get their giftee from a list of matches.
 
     Args:
-        matching (list[Match]): Pairing to use
+        matching (list[Match] | PairingIndex): Pairing to use, or its index
         giver_id (UUID): Participant to get giftee for
 
     Returns:
         UUID|None: Giftee
 
     """
+    if isinstance(matching, PairingIndex):
+        return matching.get_giftee_for_giver(giver_id)
     for m in matching:
         if m.giver_id == giver_id:
             return m.giftee_id
     return None
+
+
+def get_giver_for_giftee(
+    matching: list[Match] | PairingIndex,
+    giftee_id: UUID,
+) -> UUID | None:
+    """Given a giftee, get their giver from a list of matches.
+
+    Args:
+        matching (list[Match] | PairingIndex): Pairing to use, or its index
+        giftee_id (UUID): Participant to get giver for
+
+    Returns:
+        UUID|None: Giver
+
+    """
+    if isinstance(matching, PairingIndex):
+        return matching.get_giver_for_giftee(giftee_id)
+    for m in matching:
+        if m.giftee_id == giftee_id:
+            return m.giver_id
+    return None
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 from uuid import UUID, uuid4
 
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
 
 class Participant:
     """Data about one person participating in a gift exchange."""
 
+    __slots__ = ("active_name", "names", "uuid")
+
     def __init__(
         self,
         names: str | list[str],
@@ -52,6 +57,10 @@ class Participant:
     def change_name(self, new_name: str) -> None:
         """Add a new name for the person, and make it the default.
 
+        A ParticipantRegistry holding the participant does not learn the new
+        name, so it can't find them by it. Rename registered participants with
+        ParticipantRegistry.change_name instead.
+
         Args:
             new_name (str): the new name
 
@@ -86,20 +95,107 @@ class Participant:
         return NotImplemented
 
 
+class ParticipantRegistry:
+    """Participants of an exchange, indexed by their uuid and every name they used."""
+
+    def __init__(self, participants: list[Participant]):
+        """Index a list of participants.
+
+        Args:
+            participants (list[Participant]): Participants to index
+
+        """
+        self.participants = []
+        self._by_id = {}
+        self._by_name = {}
+        for participant in participants:
+            self.add(participant)
+
+    def add(self, participant: Participant) -> None:
+        """Add a participant to the registry.
+
+        Args:
+            participant (Participant): The participant to add
+
+        """
+        self.participants.append(participant)
+        self._by_id[participant.uuid] = participant
+        for name in participant.names:
+            self._add_name(participant, name)
+
+    def _add_name(self, participant: Participant, name: str) -> None:
+        participants = self._by_name.setdefault(name, [])
+        if participant not in participants:
+            participants.append(participant)
+
+    def change_name(self, uuid: UUID, new_name: str) -> None:
+        """Add a new name for a participant, and make it the default.
+
+        Renaming participants through the registry keeps it up to date.
+
+        Args:
+            uuid (UUID): Id of the participant
+            new_name (str): the new name
+
+        Raises:
+            ValueError: If there is no participant with that id, or the name
+                begins with a slash
+
+        """
+        participant = self.get_by_id(uuid)
+        if participant is None:
+            raise ValueError(f"There is no participant with id '{uuid}'!")
+        participant.change_name(new_name)
+        self._add_name(participant, new_name)
+
+    def get_by_id(self, uuid: UUID) -> Optional[Participant]:
+        """Get participant with given UUID.
+
+        Args:
+            uuid (UUID): UUID to search for
+
+        Returns:
+            Participant: Participant using that UUID, or None
+
+        """
+        return self._by_id.get(uuid)
+
+    def get_by_name(self, name: str) -> list[Participant]:
+        """Get all participants that use or used a name.
+
+        Args:
+            name (str): Name to search for
+
+        Returns:
+            list[Participant]: List of participants using that name
+
+        """
+        return list(self._by_name.get(name, ()))
+
+    def __len__(self) -> int:
+        return len(self.participants)
+
+    def __iter__(self) -> Iterator[Participant]:
+        return iter(self.participants)
+
+
 def get_participants_by_name(
-    participants: list[Participant],
+    participants: list[Participant] | ParticipantRegistry,
     name: str,
 ) -> list[Participant]:
     """Get all participants matching a name, from a list of participants.
 
     Args:
-        participants (list[Participant]): list of participants to search
+        participants (list[Participant] | ParticipantRegistry): list of
+            participants to search, or their registry
         name (str): Name to search for
 
     Returns:
         list[Participant]: List of participants using that name
 
     """
+    if isinstance(participants, ParticipantRegistry):
+        return participants.get_by_name(name)
     result = []
     for p in participants:
         if name in p.names:
@@ -108,13 +204,14 @@ def get_participants_by_name(
 
 
 def get_single_participant_by_name(
-    participants: list[Participant],
+    participants: list[Participant] | ParticipantRegistry,
     name: str,
 ) -> Participant:
     """Return the participant if there is exactly one with this name.
 
     Args:
-        participants (list[Participant]): Participants to search in
+        participants (list[Participant] | ParticipantRegistry): Participants to
+            search in, or their registry
         name (str): name to look for
 
     Raises:
@@ -131,19 +228,22 @@ def get_single_participant_by_name(
 
 
 def get_participant_by_id(
-    participants: list[Participant],
+    participants: list[Participant] | ParticipantRegistry,
     uuid: UUID,
 ) -> Optional[Participant]:
     """Get participant with given UUID from a list of participants.
 
     Args:
-        participants (list[Participant]): list of participants to search
+        participants (list[Participant] | ParticipantRegistry): list of
+            participants to search, or their registry
         uuid (UUID): UUID to search for
 
     Returns:
         Participant: Participant using that UUID
 
     """
+    if isinstance(participants, ParticipantRegistry):
+        return participants.get_by_id(uuid)
     for p in participants:
         if uuid == p.uuid:
             return p
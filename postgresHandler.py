@@ -0,0 +1,672 @@
+from __future__ import annotations
+
+from typing import Any, Callable
+from uuid import UUID
+
+import psycopg
+from psycopg_pool import ConnectionPool
+
+from constraint import Constraint
+from exchange import Exchange
+from instrumentation import QueryProfiler, observe_cursor
+from match import Match
+from participant import Participant
+from storage import StorageBackend
+
+# Every entry upgrades the schema by one version, see migrate()
+_migrations = [
+    [
+        "CREATE TABLE IF NOT EXISTS exchanges(slug TEXT PRIMARY KEY, name TEXT)",
+        (
+            "CREATE TABLE IF NOT EXISTS "
+            "participants(uuid TEXT PRIMARY KEY, "
+            "exchange_slug TEXT REFERENCES exchanges (slug), "
+            "position BIGINT GENERATED ALWAYS AS IDENTITY)"
+        ),
+        (
+            "CREATE TABLE IF NOT EXISTS "
+            "participant_names(id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY, "
+            "participant_id TEXT REFERENCES participants (uuid), "
+            "name TEXT, "
+            "active INTEGER, "
+            "exchange_slug TEXT REFERENCES exchanges (slug), "
+            "UNIQUE (name, exchange_slug))"
+        ),
+        (
+            "CREATE TABLE IF NOT EXISTS "
+            "matches(exchange_slug TEXT REFERENCES exchanges (slug), "
+            "giver_id TEXT REFERENCES participants (uuid), "
+            "giftee_id TEXT REFERENCES participants (uuid))"
+        ),
+        (
+            "CREATE TABLE IF NOT EXISTS "
+            "constraints(giver_id TEXT REFERENCES participants (uuid), "
+            "giftee_id TEXT REFERENCES participants (uuid), "
+            "exchange_slug TEXT REFERENCES exchanges (slug), "
+            "probability_level TEXT)"
+        ),
+        (
+            "CREATE INDEX IF NOT EXISTS participants_exchange_slug "
+            "ON participants (exchange_slug)"
+        ),
+        (
+            "CREATE INDEX IF NOT EXISTS participant_names_participant_id "
+            "ON participant_names (participant_id, active, name)"
+        ),
+        "CREATE INDEX IF NOT EXISTS matches_exchange_slug ON matches (exchange_slug)",
+        (
+            "CREATE INDEX IF NOT EXISTS matches_giver_id "
+            "ON matches (giver_id, giftee_id)"
+        ),
+        (
+            "CREATE INDEX IF NOT EXISTS matches_giftee_id "
+            "ON matches (giftee_id, giver_id)"
+        ),
+        (
+            "CREATE INDEX IF NOT EXISTS constraints_exchange_slug "
+            "ON constraints (exchange_slug)"
+        ),
+    ],
+    [
+        # Goes up with every change, so cached copies can be validated
+        "ALTER TABLE exchanges ADD COLUMN version INTEGER NOT NULL DEFAULT 1",
+    ],
+]
+
+# Key of the advisory lock held while migrating
+_MIGRATION_LOCK = 2_023_121_601
+
+
+def migrate(connection: psycopg.Connection) -> None:
+    """Bring the schema of a database up to date.
+
+    The current schema version is stored in the schema_version table, so only
+    migrations that have not run yet are applied.
+
+    Args:
+        connection (psycopg.Connection): Connection to the database
+
+    """
+    with connection.transaction():
+        # Keeps concurrently starting app instances from migrating twice. The
+        # table can't be locked yet, creating it at the same time would clash.
+        connection.execute("SELECT pg_advisory_xact_lock(%s)", (_MIGRATION_LOCK,))
+        connection.execute("CREATE TABLE IF NOT EXISTS schema_version(version INTEGER)")
+        row = connection.execute("SELECT version FROM schema_version").fetchone()
+        version = 0 if row is None else row[0]
+        for statements in _migrations[version:]:
+            for statement in statements:
+                connection.execute(statement)
+        connection.execute("DELETE FROM schema_version")
+        connection.execute(
+            "INSERT INTO schema_version VALUES (%s)",
+            (len(_migrations),),
+        )
+
+
+class PostgresConnectionPool:
+    """Reusable connections to one PostgreSQL database, shared by all threads."""
+
+    def __init__(self, conninfo: str, min_size: int = 2, max_size: int = 10):
+        """Reusable connections to one PostgreSQL database.
+
+        Migrates the database once, so connections taken from the pool can be
+        used right away.
+
+        Args:
+            conninfo (str): Connection string, eg "postgresql://user@host/db"
+            min_size (int, optional): Connections to keep open. Defaults to 2.
+            max_size (int, optional): Most connections to open. Defaults to 10.
+
+        """
+        self.conninfo = conninfo
+        self._pool = ConnectionPool(
+            conninfo,
+            min_size=min_size,
+            max_size=max_size,
+            kwargs={"autocommit": True},
+            open=True,
+        )
+        with self._pool.connection() as connection:
+            migrate(connection)
+
+    def acquire(self) -> psycopg.Connection:
+        """Borrow a connection, waiting for one if all are in use.
+
+        Returns:
+            psycopg.Connection: The connection
+
+        """
+        return self._pool.getconn()
+
+    def release(self, connection: psycopg.Connection) -> None:
+        """Return a borrowed connection to the pool.
+
+        Args:
+            connection (psycopg.Connection): The connection to return
+
+        """
+        self._pool.putconn(connection)
+
+    def close(self) -> None:
+        """Close all connections of the pool."""
+        self._pool.close()
+
+
+class PostgresHandler(StorageBackend):
+    """Manages communication with a PostgreSQL database."""
+
+    IntegrityError = psycopg.IntegrityError
+
+    def __init__(
+        self,
+        conninfo: str | None = None,
+        pool: PostgresConnectionPool | None = None,
+        observer: Callable[[str, Any, float], None] | None = None,
+        profiler: QueryProfiler | None = None,
+    ):
+        """Manages communication with a PostgreSQL database.
+
+        Args:
+            conninfo (str, optional): Connection string, eg "postgresql://user@host/db".
+                Ignored if a pool is given.
+            pool (PostgresConnectionPool, optional): Pool to borrow the connection
+                from. Defaults to None, to open and migrate a connection of its own.
+            observer (Callable[[str, Any, float], None], optional): Called with
+                every statement, its parameters and the seconds it took.
+                Defaults to None.
+            profiler (QueryProfiler, optional): Profiler to report every
+                statement to. Defaults to None.
+
+        Raises:
+            ValueError: If neither a connection string nor a pool is given
+
+        """
+        self.pool = pool
+        if self.pool is None:
+            if conninfo is None:
+                raise ValueError("Need a connection string or a pool!")
+            self.conninfo = conninfo
+            self.connection = psycopg.connect(self.conninfo, autocommit=True)
+            migrate(self.connection)
+        else:
+            self.conninfo = self.pool.conninfo
+            self.connection = self.pool.acquire()
+        observers = [observer]
+        if profiler is not None:
+            observers.append(profiler.observer(self.connection, "EXPLAIN"))
+        self.cursor = observe_cursor(self.connection.cursor(), *observers)
+
+    def close_connection(self) -> None:
+        """Close the connection to the database, or return it to the pool."""
+        self.cursor.close()
+        if self.pool is None:
+            self.connection.close()
+        else:
+            self.pool.release(self.connection)
+
+    def exchange_exists(self, slug: str) -> bool:
+        """Whether an exchange with the given slug exists in the database.
+
+        Args:
+            slug (str): Slug of the exchange
+
+        Returns:
+            bool: Whether or not the exchange exists
+
+        """
+        res = self.cursor.execute(
+            "SELECT 1 FROM exchanges WHERE slug = %s",
+            (slug,),
+        )
+        return res.fetchone() is not None
+
+    def get_exchange_version(self, slug: str) -> int:
+        """Get the version of an exchange, which goes up whenever it changes.
+
+        Args:
+            slug (str): Slug of the exchange
+
+        Returns:
+            int: Version of the exchange, or 0 if it does not exist
+
+        """
+        res = self.cursor.execute(
+            "SELECT version FROM exchanges WHERE slug = %s",
+            (slug,),
+        ).fetchone()
+        return 0 if res is None else res[0]
+
+    def participant_name_available(
+        self,
+        exchange_slug: str,
+        old_name: str,
+        new_name: str,
+    ) -> bool:
+        """Check if a participant name is already taken by someone else.
+
+        Args:
+            exchange_slug (str): slug of the exchange to search in
+            old_name (str): current name of the participant to exclude from search
+            new_name (str): name to check availability of
+
+        Returns:
+            bool: Whether the name is available
+
+        """
+        res = self.cursor.execute(
+            "SELECT 1 FROM participant_names "
+            "WHERE exchange_slug = %s "
+            "AND participant_id != ("
+            "SELECT participant_id FROM participant_names "
+            "WHERE name = %s AND exchange_slug = %s LIMIT 1"
+            ") "
+            "AND name = %s",
+            (exchange_slug, old_name, exchange_slug, new_name),
+        )
+        return res.fetchone() is None
+
+    def names_available(
+        self,
+        exchange_slugs: list[str],
+        exchange_slug: str,
+        names: list[str],
+        old_name: str = "",
+    ) -> tuple[dict[str, bool], dict[str, bool]]:
+        """Check the availability of many exchange slugs and participant names at once.
+
+        Args:
+            exchange_slugs (list[str]): Exchange slugs to check
+            exchange_slug (str): Slug of the exchange to check participant names in
+            names (list[str]): Participant names to check
+            old_name (str, optional): Current name of the participant to exclude
+                from search. Defaults to "", to exclude no one.
+
+        Returns:
+            tuple[dict[str, bool], dict[str, bool]]: Whether each exchange slug and
+            whether each participant name is available
+
+        """
+        res = self.cursor.execute(
+            "SELECT 'exchange', slug FROM exchanges "
+            "WHERE slug = ANY(%s) "
+            "UNION ALL "
+            "SELECT 'participant', name FROM participant_names "
+            "WHERE exchange_slug = %s "
+            "AND name = ANY(%s) "
+            "AND participant_id IS DISTINCT FROM ("
+            "SELECT participant_id FROM participant_names "
+            "WHERE exchange_slug = %s AND name = %s"
+            ")",
+            (exchange_slugs, exchange_slug, names, exchange_slug, old_name),
+        )
+        taken = set(res.fetchall())
+        return (
+            {slug: ("exchange", slug) not in taken for slug in exchange_slugs},
+            {name: ("participant", name) not in taken for name in names},
+        )
+
+    def get_exchange_name(self, slug: str) -> str:
+        """Get the name of an exchange for a given slug.
+
+        Args:
+            slug (str): Slug of the exchange
+
+        Raises:
+            ValueError: If the exchange does not exist
+
+        Returns:
+            str: Name of the exchange
+
+        """
+        result = self.cursor.execute(
+            "SELECT name FROM exchanges WHERE slug = %s",
+            (slug,),
+        ).fetchone()
+        if result is None:
+            raise ValueError(f"There is no exchange with slug '{slug}'!")
+        return result[0]
+
+    def create_exchange(
+        self,
+        exchange: Exchange,
+        participants: list[Participant],
+        constraints: list[Constraint],
+        pairing: list[Match],
+    ) -> None:
+        """Create a new exchange in the database.
+
+        Args:
+            exchange (Exchange): The exchange to create
+            participants (list[Participant]): The participants to create
+            constraints (list[Constraint]): The constraints of this exchange
+            pairing (list[Match]): The pairing to create
+
+        Raises:
+            IntegrityError: If the exchange or one of the names already exists.
+                Nothing is written in that case.
+
+        """
+        with self.connection.transaction():
+            self.cursor.execute(
+                "INSERT INTO exchanges (slug, name) VALUES (%s, %s)",
+                (exchange.slug, exchange.name),
+            )
+            self.cursor.executemany(
+                "INSERT INTO participants (uuid, exchange_slug) VALUES (%s, %s)",
+                [(str(p.uuid), exchange.slug) for p in participants],
+            )
+            self.cursor.executemany(
+                "INSERT INTO participant_names "
+                "(participant_id, name, active, exchange_slug) "
+                "VALUES (%s, %s, %s, %s)",
+                [
+                    (str(p.uuid), name, int(i == p.active_name), exchange.slug)
+                    for p in participants
+                    for i, name in enumerate(p.names)
+                ],
+            )
+            self.cursor.executemany(
+                "INSERT INTO constraints "
+                "(giver_id, giftee_id, exchange_slug, probability_level) "
+                "VALUES (%s, %s, %s, %s)",
+                [
+                    (
+                        str(c.giver_id),
+                        str(c.giftee_id),
+                        exchange.slug,
+                        c.probability_level,
+                    )
+                    for c in constraints
+                ],
+            )
+            self.cursor.executemany(
+                "INSERT INTO matches (exchange_slug, giver_id, giftee_id) "
+                "VALUES (%s, %s, %s)",
+                [(exchange.slug, str(m.giver_id), str(m.giftee_id)) for m in pairing],
+            )
+
+    def get_exchange(self, slug: str) -> Exchange:
+        """Get exchange by it's slug.
+
+        Args:
+            slug (str): slug of the exchange to get
+
+        Raises:
+            ValueError: If the exchange does not exist
+
+        Returns:
+            Exchange: The exchange object from the database
+
+        """
+        exchange_name = self.get_exchange_name(slug)
+
+        result = self.cursor.execute(
+            "SELECT p.uuid, n.name, n.active "
+            "FROM participants AS p "
+            "JOIN participant_names AS n "
+            "ON n.participant_id = p.uuid "
+            "WHERE p.exchange_slug = %s "
+            "ORDER BY p.position, n.id",
+            (slug,),
+        )
+        participants_by_id = {}
+        for uuid, participant_name, active in result.fetchall():
+            if uuid not in participants_by_id:
+                participants_by_id[uuid] = Participant(names=[], uuid=UUID(uuid))
+            participant = participants_by_id[uuid]
+            participant.names.append(participant_name)
+            if active:
+                participant.active_name = len(participant.names) - 1
+        participants = list(participants_by_id.values())
+
+        def get_uuid(participant_id: str) -> UUID:
+            if participant_id in participants_by_id:
+                return participants_by_id[participant_id].uuid
+            return UUID(participant_id)
+
+        result = self.cursor.execute(
+            "SELECT giver_id, giftee_id, probability_level "
+            "FROM constraints WHERE exchange_slug = %s",
+            (slug,),
+        )
+        constraints = [
+            Constraint(get_uuid(giver_id), get_uuid(giftee_id), probability_level)
+            for giver_id, giftee_id, probability_level in result.fetchall()
+        ]
+
+        result = self.cursor.execute(
+            "SELECT giver_id, giftee_id FROM matches WHERE exchange_slug = %s",
+            (slug,),
+        )
+        pairing = [
+            Match(get_uuid(giver_id), get_uuid(giftee_id))
+            for giver_id, giftee_id in result.fetchall()
+        ]
+
+        return Exchange(exchange_name, participants, constraints, pairing)
+
+    def get_participant(self, participant_id: UUID) -> Participant:
+        """Get participant by their uuid.
+
+        Args:
+            participant_id (UUID): Id of the participant
+
+        Raises:
+            ValueError: If there is no participant with that id
+
+        Returns:
+            Participant: The participant with the id
+
+        """
+        result = self.cursor.execute(
+            "SELECT name, active FROM participant_names "
+            "WHERE participant_id = %s ORDER BY id",
+            (str(participant_id),),
+        )
+        participant = Participant(names=[], uuid=UUID(str(participant_id)))
+        for participant_name, active in result.fetchall():
+            participant.names.append(participant_name)
+            if active:
+                participant.active_name = len(participant.names) - 1
+        if len(participant.names) == 0:
+            raise ValueError(f"There is no participant with id '{participant_id}'!")
+        return participant
+
+    def change_participant_name(
+        self,
+        exchange_slug: str,
+        old_name: str,
+        new_name: str,
+    ) -> None:
+        """Change the active name of the participant.
+
+        Args:
+            exchange_slug (str): Slug of the exchange to use
+            old_name (str): current name of the participant
+            new_name (str): new name of the participant
+
+        Raises:
+            ValueError: If there is no participant with the given name in the exchange
+
+        """
+        with self.connection.transaction():
+            result = self.cursor.execute(
+                "SELECT participant_id FROM participant_names "
+                "WHERE name = %s AND exchange_slug = %s",
+                (old_name, exchange_slug),
+            ).fetchone()
+            if result is None:
+                raise ValueError(f"There is no participant with name '{old_name}'!")
+            participant_id = result[0]
+            self.cursor.execute(
+                "UPDATE participant_names SET active = 0 "
+                "WHERE participant_id = %s AND name = %s",
+                (participant_id, old_name),
+            )
+            name_exists = (
+                self.cursor.execute(
+                    "SELECT 1 FROM participant_names "
+                    "WHERE participant_id = %s AND name = %s",
+                    (participant_id, new_name),
+                ).fetchone()
+                is not None
+            )
+            if name_exists:
+                # Don't add a new name, just set the existing new_name to active
+                self.cursor.execute(
+                    "UPDATE participant_names SET active = 1 "
+                    "WHERE participant_id = %s AND name = %s",
+                    (participant_id, new_name),
+                )
+            else:
+                # Add a new name
+                self.cursor.execute(
+                    "INSERT INTO participant_names "
+                    "(participant_id, name, active, exchange_slug) "
+                    "VALUES (%s, %s, 1, %s)",
+                    (participant_id, new_name, exchange_slug),
+                )
+            self.cursor.execute(
+                "UPDATE exchanges SET version = version + 1 WHERE slug = %s",
+                (exchange_slug,),
+            )
+
+    def get_active_name(self, exchange_slug: str, name: str) -> str:
+        """Get up-to-date name of a participant that used to go by the given name.
+
+        Args:
+            exchange_slug (str): Slug of the exchange to search in
+            name (str): old name of the participant
+
+        Raises:
+            ValueError: if there is no participant with that name
+
+        Returns:
+            str: the current name of the participant
+
+        """
+        result = self.cursor.execute(
+            "SELECT name FROM participant_names "
+            "WHERE exchange_slug = %s "
+            "AND active = 1 "
+            "AND participant_id = ("
+            "SELECT participant_id FROM participant_names "
+            "WHERE exchange_slug = %s "
+            "AND name = %s)",
+            (exchange_slug, exchange_slug, name),
+        ).fetchone()
+        if result is None:
+            raise ValueError(
+                f"Could not find a match for exchange {exchange_slug} "
+                f"and participant name {name}!",
+            )
+        return result[0]
+
+    def get_participant_result(
+        self,
+        exchange_slug: str,
+        name: str,
+    ) -> tuple[str, str, str, str]:
+        """Get everything needed to show a participant their result, in one query.
+
+        Args:
+            exchange_slug (str): Slug of the exchange to search in
+            name (str): current or old name of the participant
+
+        Raises:
+            ValueError: If there is no participant with that name in the exchange
+
+        Returns:
+            tuple[str, str, str, str]: Name of the exchange, current name of the
+            participant, current name of their giftee and current name of their giver
+
+        """
+        result = self.cursor.execute(
+            "SELECT e.name, active_name.name, giftee_name.name, giver_name.name "
+            "FROM participant_names AS n "
+            "JOIN exchanges AS e "
+            "ON e.slug = n.exchange_slug "
+            "JOIN participant_names AS active_name "
+            "ON active_name.participant_id = n.participant_id "
+            "AND active_name.active = 1 "
+            "JOIN matches AS giftee_match "
+            "ON giftee_match.giver_id = n.participant_id "
+            "JOIN participant_names AS giftee_name "
+            "ON giftee_name.participant_id = giftee_match.giftee_id "
+            "AND giftee_name.active = 1 "
+            "JOIN matches AS giver_match "
+            "ON giver_match.giftee_id = n.participant_id "
+            "JOIN participant_names AS giver_name "
+            "ON giver_name.participant_id = giver_match.giver_id "
+            "AND giver_name.active = 1 "
+            "WHERE n.exchange_slug = %s "
+            "AND n.name = %s",
+            (exchange_slug, name),
+        ).fetchone()
+        if result is None:
+            raise ValueError(
+                f"There is no participant with name '{name}' "
+                f"in exchange '{exchange_slug}'!",
+            )
+        return result
+
+    def get_giftee_for_giver(self, exchange_slug: str, giver_name: str) -> Participant:
+        """Get the participant a given participant will get a gift for.
+
+        Args:
+            exchange_slug (str): slug of the exchange to search in
+            giver_name (str): name of the giver
+
+        Raises:
+            ValueError: If there is no participant with the given name in the exchange
+
+        Returns:
+            Participant: Participant to get a gift for (giftee)
+
+        """
+        result = self.cursor.execute(
+            "SELECT m.giftee_id "
+            "FROM matches AS m "
+            "JOIN participant_names AS n "
+            "ON n.participant_id = m.giver_id "
+            "WHERE n.name = %s "
+            "AND n.exchange_slug = %s",
+            (giver_name, exchange_slug),
+        ).fetchone()
+        if result is None:
+            raise ValueError(
+                f"There is no participant with name '{giver_name}' "
+                f"in exchange '{exchange_slug}'!",
+            )
+        return self.get_participant(result[0])
+
+    def get_giver_for_giftee(self, exchange_slug: str, giftee_name: str) -> Participant:
+        """Get the participant a given participant will be getting a gift from.
+
+        Args:
+            exchange_slug (str): slug of the exchange to search in
+            giftee_name (str): name of the giftee
+
+        Raises:
+            ValueError: If there is no participant with the given name in the exchange
+
+        Returns:
+            Participant: Participant to get a gift from (giver)
+
+        """
+        result = self.cursor.execute(
+            "SELECT m.giver_id "
+            "FROM matches AS m "
+            "JOIN participant_names AS n "
+            "ON n.participant_id = m.giftee_id "
+            "WHERE n.name = %s "
+            "AND n.exchange_slug = %s",
+            (giftee_name, exchange_slug),
+        ).fetchone()
+        if result is None:
+            raise ValueError(
+                f"There is no participant with name '{giftee_name}' "
+                f"in exchange '{exchange_slug}'!",
+            )
+        return self.get_participant(result[0])
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+
+class PageKey(NamedTuple):
+    """Everything a rendered page depends on."""
+
+    template_name: str
+    exchange_slug: str
+    participant_name: str
+    locale: str
+    version: int
+
+
+class RenderCache:
+    """Bounded in-process cache of rendered pages.
+
+    Pages of an exchange only change when the exchange does, so the version of
+    the exchange is part of the key and outdated pages are never served. They
+    are dropped when the exchange is invalidated or, if another process changed
+    it, once they are the least recently used.
+    """
+
+    def __init__(self, maxsize: int = 16 * 1024 * 1024):
+        """Bounded cache of rendered pages, dropping the least recently used first.
+
+        Args:
+            maxsize (int, optional): Memory the pages may take up, in bytes.
+                Defaults to 16 MiB.
+
+        """
+        self.maxsize = maxsize
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._pages = OrderedDict()
+        self._keys_by_exchange = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: PageKey) -> str | None:
+        """Get a rendered page.
+
+        Args:
+            key (PageKey): What the page depends on
+
+        Returns:
+            str | None: The page, or None if it is not cached
+
+        """
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._pages.move_to_end(key)
+            return page
+
+    def put(self, key: PageKey, page: str) -> None:
+        """Cache a rendered page.
+
+        Pages larger than the whole cache are not cached.
+
+        Args:
+            key (PageKey): What the page depends on
+            page (str): The rendered page
+
+        """
+        page_size = sys.getsizeof(page)
+        if page_size > self.maxsize:
+            return
+        with self._lock:
+            self._remove(key)
+            self._pages[key] = page
+            self._keys_by_exchange.setdefault(key.exchange_slug, set()).add(key)
+            self.size += page_size
+            while self.size > self.maxsize:
+                self._remove(next(iter(self._pages)))
+
+    def _remove(self, key: PageKey) -> None:
+        page = self._pages.pop(key, None)
+        if page is None:
+            return
+        self.size -= sys.getsizeof(page)
+        keys = self._keys_by_exchange[key.exchange_slug]
+        keys.discard(key)
+        if not keys:
+            del self._keys_by_exchange[key.exchange_slug]
+
+    def invalidate(self, exchange_slug: str) -> None:
+        """Drop all pages of an exchange, after it was changed in the database.
+
+        Args:
+            exchange_slug (str): slug of the exchange that changed
+
+        """
+        with self._lock:
+            for key in list(self._keys_by_exchange.get(exchange_slug, ())):
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drop all pages and reset the counters."""
+        with self._lock:
+            self._pages.clear()
+            self._keys_by_exchange.clear()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._pages)
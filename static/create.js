@@ -124,14 +124,59 @@ document.getElementById("participant-list").addEventListener("click", (e) => {
   }
 });
 
-document.getElementById("next-button").addEventListener("click", () => {
+async function isExchangeNameAvailable() {
   const form = document.getElementById("participant-form");
+  const exchangeName = form.elements["exchangeName"].value;
+  try {
+    const res = await fetch(
+      `/check_exchange_name/?name=${encodeURIComponent(exchangeName)}`
+    );
+    if (res.ok) {
+      const data = await res.json();
+      return data.nameAvailable;
+    }
+  } catch (error) {
+    // Creating the exchange checks the name again, so go on without the check
+  }
+  return true;
+}
+
+function showErrorMessage(message) {
+  // Same place as the error messages the server renders into the page
+  let errorMessage = document.querySelector(".exchange-creation-error");
+  if (!errorMessage) {
+    errorMessage = document.createElement("p");
+    errorMessage.className = "exchange-creation-error";
+    errorMessage.setAttribute("role", "alert");
+    document.getElementById("participant-form").before(errorMessage);
+  }
+  errorMessage.textContent = message;
+}
+
+let checking = false;
+
+document.getElementById("next-button").addEventListener("click", async () => {
+  const form = document.getElementById("participant-form");
+  // Ignore repeated clicks while the exchange name is being checked
+  if (checking) {
+    return;
+  }
   if (form.checkValidity()) {
     validateNames();
   }
   if (form.checkValidity()) {
     validateSufficientParticipants();
   }
+  if (form.checkValidity()) {
+    checking = true;
+    const nameAvailable = await isExchangeNameAvailable();
+    checking = false;
+    if (!nameAvailable) {
+      // Someone created an exchange with this name since this page loaded
+      showErrorMessage(_("This exchange name is not available."));
+      return;
+    }
+  }
   if (form.checkValidity()) {
     const participants = document.getElementById("participant-list").children;
     const giverSelect = document.getElementsByClassName("giver")[0];
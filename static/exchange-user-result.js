@@ -22,24 +22,45 @@ document.getElementById("spoiler-cover").addEventListener("click", (e) => {
 
 const changeNameForm = document.getElementById("rename_participant");
 const nameInput = document.getElementById("participant_name");
+// Taken names stay taken, so they never need to be checked twice
+const unavailableNames = new Set();
+let checking = false;
+
+async function isNameAvailable(name) {
+  if (unavailableNames.has(name)) {
+    return false;
+  }
+  const res = await fetch(
+    `/check_participant_name/?exchangeslug=${encodeURIComponent(
+      exchangeslug
+    )}&newname=${encodeURIComponent(name)}&oldname=${encodeURIComponent(
+      oldname
+    )}`
+  );
+  const data = await res.json();
+  if (!data.nameAvailable) {
+    unavailableNames.add(name);
+  }
+  return data.nameAvailable;
+}
+
 changeNameForm.addEventListener("submit", async (e) => {
   e.preventDefault();
+  // Ignore repeated submits while the name is being checked
+  if (checking) {
+    return;
+  }
 
   if (oldname == nameInput.value) {
     nameInput.setCustomValidity(_("That's already your name."));
   } else if (nameInput.value.startsWith("/")) {
     nameInput.setCustomValidity(_("Names may not begin with a slash."));
   } else {
-    const res = await fetch(
-      `/check_participant_name?exchangeslug=${encodeURIComponent(
-        exchangeslug
-      )}&newname=${encodeURIComponent(
-        nameInput.value
-      )}&oldname=${encodeURIComponent(oldname)}`
-    );
-    const data = await res.json();
-
-    if (data.nameAvailable) {
+    checking = true;
+    const nameAvailable = await isNameAvailable(nameInput.value);
+    checking = false;
+
+    if (nameAvailable) {
       changeNameForm.submit();
     } else {
       nameInput.setCustomValidity(
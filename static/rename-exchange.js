@@ -1,14 +1,35 @@
 const form = document.getElementById("rename_exchange");
 const nameInput = document.getElementById("exchange_name");
-form.addEventListener("submit", async (e) => {
-  e.preventDefault();
+// Taken names stay taken, so they never need to be checked twice
+const unavailableNames = new Set();
+let checking = false;
 
+async function isNameAvailable(name) {
+  if (unavailableNames.has(name)) {
+    return false;
+  }
   const res = await fetch(
-    `/check_exchange_name?name=${encodeURIComponent(nameInput.value)}`
+    `/check_exchange_name/?name=${encodeURIComponent(name)}`
   );
   const data = await res.json();
+  if (!data.nameAvailable) {
+    unavailableNames.add(name);
+  }
+  return data.nameAvailable;
+}
+
+form.addEventListener("submit", async (e) => {
+  e.preventDefault();
+  // Ignore repeated submits while the name is being checked
+  if (checking) {
+    return;
+  }
+
+  checking = true;
+  const nameAvailable = await isNameAvailable(nameInput.value);
+  checking = false;
 
-  if (data.nameAvailable) {
+  if (nameAvailable) {
     form.submit();
   } else {
     nameInput.setCustomValidity(_("This exchange name is not available."));
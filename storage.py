@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from uuid import UUID
+
+    from constraint import Constraint
+    from exchange import Exchange
+    from match import Match
+    from participant import Participant
+
+
+class StorageBackend(ABC):
+    """Interface for storing exchanges, implemented for every supported database.
+
+    Implementations set IntegrityError to the exception their database raises
+    when creating an exchange that clashes with existing data.
+    """
+
+    IntegrityError: type[Exception] = Exception
+
+    @abstractmethod
+    def close_connection(self) -> None:
+        """Close the connection to the database, or return it to its pool."""
+
+    @abstractmethod
+    def exchange_exists(self, slug: str) -> bool:
+        """Whether an exchange with the given slug exists in the database.
+
+        Args:
+            slug (str): Slug of the exchange
+
+        Returns:
+            bool: Whether or not the exchange exists
+
+        """
+
+    @abstractmethod
+    def get_exchange_version(self, slug: str) -> int:
+        """Get the version of an exchange, which goes up whenever it changes.
+
+        Args:
+            slug (str): Slug of the exchange
+
+        Returns:
+            int: Version of the exchange, or 0 if it does not exist
+
+        """
+
+    @abstractmethod
+    def participant_name_available(
+        self,
+        exchange_slug: str,
+        old_name: str,
+        new_name: str,
+    ) -> bool:
+        """Check if a participant name is already taken by someone else.
+
+        Args:
+            exchange_slug (str): slug of the exchange to search in
+            old_name (str): current name of the participant to exclude from search
+            new_name (str): name to check availability of
+
+        Returns:
+            bool: Whether the name is available
+
+        """
+
+    @abstractmethod
+    def names_available(
+        self,
+        exchange_slugs: list[str],
+        exchange_slug: str,
+        names: list[str],
+        old_name: str = "",
+    ) -> tuple[dict[str, bool], dict[str, bool]]:
+        """Check the availability of many exchange slugs and participant names at once.
+
+        Args:
+            exchange_slugs (list[str]): Exchange slugs to check
+            exchange_slug (str): Slug of the exchange to check participant names in
+            names (list[str]): Participant names to check
+            old_name (str, optional): Current name of the participant to exclude
+                from search. Defaults to "", to exclude no one.
+
+        Returns:
+            tuple[dict[str, bool], dict[str, bool]]: Whether each exchange slug and
+            whether each participant name is available
+
+        """
+
+    @abstractmethod
+    def get_exchange_name(self, slug: str) -> str:
+        """Get the name of an exchange for a given slug.
+
+        Args:
+            slug (str): Slug of the exchange
+
+        Raises:
+            ValueError: If the exchange does not exist
+
+        Returns:
+            str: Name of the exchange
+
+        """
+
+    @abstractmethod
+    def create_exchange(
+        self,
+        exchange: Exchange,
+        participants: list[Participant],
+        constraints: list[Constraint],
+        pairing: list[Match],
+    ) -> None:
+        """Create a new exchange in the database, all or nothing.
+
+        Args:
+            exchange (Exchange): The exchange to create
+            participants (list[Participant]): The participants to create
+            constraints (list[Constraint]): The constraints of this exchange
+            pairing (list[Match]): The pairing to create
+
+        Raises:
+            IntegrityError: If the exchange or one of the names already exists
+
+        """
+
+    @abstractmethod
+    def get_exchange(self, slug: str) -> Exchange:
+        """Get exchange by it's slug.
+
+        Args:
+            slug (str): slug of the exchange to get
+
+        Raises:
+            ValueError: If the exchange does not exist
+
+        Returns:
+            Exchange: The exchange object from the database
+
+        """
+
+    @abstractmethod
+    def get_participant(self, participant_id: UUID) -> Participant:
+        """Get participant by their uuid.
+
+        Args:
+            participant_id (UUID): Id of the participant
+
+        Raises:
+            ValueError: If there is no participant with that id
+
+        Returns:
+            Participant: The participant with the id
+
+        """
+
+    @abstractmethod
+    def change_participant_name(
+        self,
+        exchange_slug: str,
+        old_name: str,
+        new_name: str,
+    ) -> None:
+        """Change the active name of the participant.
+
+        Args:
+            exchange_slug (str): Slug of the exchange to use
+            old_name (str): current name of the participant
+            new_name (str): new name of the participant
+
+        Raises:
+            ValueError: If there is no participant with the given name in the exchange
+
+        """
+
+    @abstractmethod
+    def get_active_name(self, exchange_slug: str, name: str) -> str:
+        """Get up-to-date name of a participant that used to go by the given name.
+
+        Args:
+            exchange_slug (str): Slug of the exchange to search in
+            name (str): old name of the participant
+
+        Raises:
+            ValueError: if there is no participant with that name
+
+        Returns:
+            str: the current name of the participant
+
+        """
+
+    @abstractmethod
+    def get_participant_result(
+        self,
+        exchange_slug: str,
+        name: str,
+    ) -> tuple[str, str, str, str]:
+        """Get everything needed to show a participant their result.
+
+        Args:
+            exchange_slug (str): Slug of the exchange to search in
+            name (str): current or old name of the participant
+
+        Raises:
+            ValueError: If there is no participant with that name in the exchange
+
+        Returns:
+            tuple[str, str, str, str]: Name of the exchange, current name of the
+            participant, current name of their giftee and current name of their giver
+
+        """
+
+    @abstractmethod
+    def get_giftee_for_giver(self, exchange_slug: str, giver_name: str) -> Participant:
+        """Get the participant a given participant will get a gift for.
+
+        Args:
+            exchange_slug (str): slug of the exchange to search in
+            giver_name (str): name of the giver
+
+        Raises:
+            ValueError: If there is no participant with the given name in the exchange
+
+        Returns:
+            Participant: Participant to get a gift for (giftee)
+
+        """
+
+    @abstractmethod
+    def get_giver_for_giftee(self, exchange_slug: str, giftee_name: str) -> Participant:
+        """Get the participant a given participant will be getting a gift from.
+
+        Args:
+            exchange_slug (str): slug of the exchange to search in
+            giftee_name (str): name of the giftee
+
+        Raises:
+            ValueError: If there is no participant with the given name in the exchange
+
+        Returns:
+            Participant: Participant to get a gift from (giver)
+
+        """
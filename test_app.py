@@ -0,0 +1,237 @@
+from pathlib import Path
+
+import pytest
+from flask.testing import FlaskClient
+
+from app import app, exchange_cache, get_db, render_cache
+from constraint import Constraint
+from exchange import Exchange
+from match import Match
+from participant import Participant
+from utils import PairingStatistics, get_pairing_exact, pairing_solvers
+
+
+@pytest.fixture
+def client(tmp_path: Path, exchange: Exchange):
+    app.config["DATABASE"] = str(tmp_path / "db.sqlite")
+    with app.app_context():
+        get_db().create_exchange(
+            exchange,
+            exchange.participants,
+            exchange.constraints,
+            exchange.pairing,
+        )
+    yield app.test_client()
+    app.extensions.pop("db_pool").close()
+    exchange_cache.clear()
+    render_cache.clear()
+
+
+def test_exchange_page_etag(client: FlaskClient):
+    response = client.get("/test-exchange/")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.cache_control.no_cache
+    assert "Accept-Language" in response.vary
+
+    response = client.get("/test-exchange/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+    client.post("/test-exchange/results/Alice", data={"participant_name": "Alicia"})
+    response = client.get("/test-exchange/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "Alicia" in response.text
+
+
+def test_exchange_page_etag_per_language(client: FlaskClient):
+    english = client.get("/test-exchange/", headers={"Accept-Language": "en"})
+    german = client.get("/test-exchange/", headers={"Accept-Language": "de"})
+    assert english.headers["ETag"] != german.headers["ETag"]
+    response = client.get(
+        "/test-exchange/",
+        headers={"Accept-Language": "de", "If-None-Match": english.headers["ETag"]},
+    )
+    assert response.status_code == 200
+
+
+def test_result_page_etag(client: FlaskClient):
+    response = client.get("/test-exchange/results/Alice")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "Accept-Language" in response.vary
+
+    response = client.get(
+        "/test-exchange/results/Alice",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    # Every page of the exchange has the same ETag, but not every name is current
+    response = client.get(
+        "/test-exchange/results/Nobody",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 404
+    response = client.get("/test-exchange/results/Bob", headers={"If-None-Match": etag})
+    assert response.status_code == 302
+    assert response.location.endswith("/test-exchange/results/Robert")
+
+    client.post("/test-exchange/results/Carol", data={"participant_name": "Caroline"})
+    response = client.get(
+        "/test-exchange/results/Alice",
+        headers={"If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "Caroline" in response.text
+
+
+def test_static_files_immutable(client: FlaskClient):
+    with app.test_request_context():
+        url = app.url_for("static", filename="style.css")
+    assert "?v=" in url
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == app.config["STATIC_MAX_AGE"]
+    response.close()
+
+    # Without the current hash the file may change under the same URL
+    response = client.get("/static/style.css")
+    assert not response.cache_control.immutable
+    response.close()
+    response = client.get("/static/style.css?v=outdated")
+    assert not response.cache_control.immutable
+    response.close()
+
+
+def test_check_name_etag(client: FlaskClient):
+    urls = [
+        "/check_exchange_name/?name=Test+Exchange",
+        "/check_participant_name/?exchangeslug=test-exchange&newname=Dave&oldname=Carol",
+    ]
+    etags = {}
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200
+        etags[url] = response.headers["ETag"]
+        response = client.get(url, headers={"If-None-Match": etags[url]})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etags[url]
+        assert response.cache_control.no_cache
+
+    # Renaming anyone changes the version of the exchange, so both answers
+    # have to be revalidated
+    client.post("/test-exchange/results/Alice", data={"participant_name": "Dave"})
+    for url in urls:
+        response = client.get(url, headers={"If-None-Match": etags[url]})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etags[url]
+        assert response.json == {"nameAvailable": False}
+
+
+def test_check_names(client: FlaskClient):
+    response = client.post(
+        "/check_names/",
+        json={
+            "exchangeNames": ["Test Exchange", "Other Exchange", "!!!"],
+            "exchangeSlug": "test-exchange",
+            "participantNames": ["Bob", " Dave "],
+            "oldName": "Alice",
+        },
+    )
+    assert response.status_code == 200
+    assert response.json == {
+        "exchangeNames": {
+            "Test Exchange": False,
+            "Other Exchange": True,
+            "!!!": False,
+        },
+        "participantNames": {"Bob": False, "Dave": True},
+    }
+    assert client.post("/check_names/", json={}).json == {
+        "exchangeNames": {},
+        "participantNames": {},
+    }
+
+    too_many = ["Dave"] * (app.config["MAX_CHECKED_NAMES"] + 1)
+    response = client.post("/check_names/", json={"participantNames": too_many})
+    assert response.status_code == 413
+
+    for body in [
+        [1, 2],
+        "Alice",
+        {"exchangeNames": 5},
+        {"participantNames": "Alice"},
+        {"participantNames": ["Alice", 5]},
+        {"exchangeSlug": ["test-exchange"]},
+        {"oldName": None},
+    ]:
+        assert client.post("/check_names/", json=body).status_code == 400
+    response = client.post(
+        "/check_names/",
+        data="{",
+        content_type="application/json",
+    )
+    assert response.status_code == 400
+
+
+def test_create_exchange_falls_back_to_exact_solver(client: FlaskClient):
+    # Everyone sits in a circle and may only give to a neighbour, which
+    # sampling is too unlikely to hit
+    names = [f"P{i}" for i in range(12)]
+    constraints = [
+        (giver, names[j])
+        for i, giver in enumerate(names)
+        for j in range(i + 2, len(names))
+        if (i, j) != (0, len(names) - 1)
+    ]
+    response = client.post(
+        "/dense-exchange/create/",
+        data={
+            "exchangeName": "Dense Exchange",
+            "participant": names,
+            "giver": [""] + [giver for giver, _giftee in constraints],
+            "giftee": [""] + [giftee for _giver, giftee in constraints],
+            "probability-level": [""] + ["never"] * len(constraints),
+        },
+    )
+    assert response.status_code == 302
+    with app.app_context():
+        for i, name in enumerate(names):
+            giftee = get_db().get_giftee_for_giver("dense-exchange", name)
+            assert giftee.get_name() in [names[i - 1], names[(i + 1) % 12]]
+
+
+def test_create_exchange_parallel_time_budget(
+    client: FlaskClient,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    budgets = []
+
+    def solver(
+        participants: list[Participant],
+        constraints: list[Constraint],
+        statistics: PairingStatistics,
+        time_budget: float,
+    ) -> list[Match]:
+        budgets.append(time_budget)
+        return get_pairing_exact(participants, constraints, statistics=statistics)
+
+    monkeypatch.setitem(pairing_solvers, "parallel", solver)
+    monkeypatch.setitem(app.config, "PAIRING_SOLVER", "parallel")
+    monkeypatch.setitem(app.config, "PAIRING_TIME_BUDGET", 2.5)
+    response = client.post(
+        "/timed-exchange/create/",
+        data={
+            "exchangeName": "Timed Exchange",
+            "participant": ["Alice", "Bob", "Carol"],
+            "giver": [""],
+            "giftee": [""],
+            "probability-level": [""],
+        },
+    )
+    assert response.status_code == 302
+    assert budgets == [2.5]
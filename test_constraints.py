@@ -1,4 +1,9 @@
-from constraint import Constraint, get_probability_from_constraints
+from constraint import (
+    Constraint,
+    ConstraintIndex,
+    get_probability_from_constraints,
+    get_restricted_pairs,
+)
 from participant import Participant
 
 
@@ -14,3 +19,42 @@ def test_remove_duplicates():
     cs2 = [c3, c4]
     assert get_probability_from_constraints(cs2, p1, p2) == 0
     assert get_probability_from_constraints(cs2, p2, p1) == 0
+
+
+def test_constraint_index():
+    p1 = Participant(names="Alice").uuid
+    p2 = Participant(names="Bob").uuid
+    p3 = Participant(names="Carol").uuid
+    cs = [
+        Constraint(p1, p2, "3_past_exchange"),
+        Constraint(p1, p2, "2_past_exchange"),
+        Constraint(p3, p1, "never"),
+    ]
+    index = ConstraintIndex(cs)
+    assert index.get_probability(p1, p2) == 0.2
+    assert index.get_probability(p2, p1) == 1
+    assert index.get_probability(p1, p3) == 0
+    assert index.get_probability(p3, p1) == 0
+    assert (p1, p3) in index
+    assert (p2, p3) not in index
+    assert set(get_restricted_pairs(index)) == set(get_restricted_pairs(cs))
+    for giver in [p1, p2, p3]:
+        for giftee in [p1, p2, p3]:
+            assert get_probability_from_constraints(
+                index,
+                giver,
+                giftee,
+            ) == get_probability_from_constraints(cs, giver, giftee)
+
+
+def test_constraint_hashable():
+    p1 = Participant(names="Alice").uuid
+    p2 = Participant(names="Bob").uuid
+    cs = {
+        Constraint(p1, p2, "never"),
+        Constraint(p1, p2, "never"),
+        Constraint(p1, p2, "1_past_exchange"),
+        Constraint(p2, p1, "never"),
+    }
+    assert len(cs) == 3
+    assert Constraint(p1, p2, "never") in cs
@@ -0,0 +1,138 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from databaseHandler import (
+    ConnectionPool,
+    ConnectionProfile,
+    DatabaseHandler,
+    connect,
+    migrate,
+)
+from exchange import Exchange
+
+
+@pytest.fixture
+def db(tmp_path: Path, exchange: Exchange):
+    db = DatabaseHandler(str(tmp_path / "db.sqlite"))
+    db.create_exchange(
+        exchange,
+        exchange.participants,
+        exchange.constraints,
+        exchange.pairing,
+    )
+    yield db
+    db.close_connection()
+
+
+def test_migrate(tmp_path: Path):
+    connection = sqlite3.connect(tmp_path / "db.sqlite")
+    migrate(connection)
+    version = connection.execute("PRAGMA user_version").fetchone()[0]
+    assert version > 0
+    migrate(connection)
+    assert connection.execute("PRAGMA user_version").fetchone()[0] == version
+    connection.close()
+
+
+def test_concurrent_migrate(tmp_path: Path):
+    path = str(tmp_path / "db.sqlite")
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def start_instance() -> None:
+        connection = connect(path)
+        barrier.wait()
+        try:
+            migrate(connection)
+        except sqlite3.Error as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=start_instance) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+
+def test_connection_pool(tmp_path: Path):
+    pool = ConnectionPool(str(tmp_path / "db.sqlite"))
+    db = DatabaseHandler(pool=pool)
+    connection = db.connection
+    assert not db.exchange_exists("test-exchange")
+    db.close_connection()
+    db = DatabaseHandler(pool=pool)
+    assert db.connection is connection
+    other_db = DatabaseHandler(pool=pool)
+    assert other_db.connection is not connection
+    other_db.close_connection()
+    db.close_connection()
+    pool.close()
+
+
+def test_hot_queries_use_indexes(db: DatabaseHandler):
+    statements = []
+    db.connection.set_trace_callback(statements.append)
+    db.get_exchange("test-exchange")
+    db.get_active_name("test-exchange", "Bob")
+    db.get_giftee_for_giver("test-exchange", "Alice")
+    db.get_giver_for_giftee("test-exchange", "Alice")
+    db.participant_name_available("test-exchange", "Alice", "Bob")
+    db.get_participant_result("test-exchange", "Bob")
+    db.names_available(["test-exchange"], "test-exchange", ["Alice", "Bob"], "Bob")
+    db.connection.set_trace_callback(None)
+
+    queries = [s for s in statements if s.startswith("SELECT")]
+    assert queries
+    for query in queries:
+        plan = db.connection.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+        for _id, _parent, _unused, detail in plan:
+            assert not detail.startswith("SCAN"), f"{detail} in {query}"
+
+
+def test_get_exchange_query_count(db: DatabaseHandler):
+    statements = []
+    db.connection.set_trace_callback(statements.append)
+    db.get_exchange("test-exchange")
+    db.connection.set_trace_callback(None)
+    assert len(statements) == 4
+
+
+def test_connection_profile(tmp_path: Path):
+    db = DatabaseHandler(
+        str(tmp_path / "db.sqlite"),
+        profile=ConnectionProfile(synchronous="full", busy_timeout=1234),
+    )
+    assert db.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert db.connection.execute("PRAGMA synchronous").fetchone()[0] == 2
+    assert db.connection.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+    db.close_connection()
+
+    with pytest.raises(ValueError):
+        ConnectionProfile(journal_mode="wal; DROP TABLE exchanges")
+
+
+def test_retry_when_locked(db: DatabaseHandler):
+    db.profile = ConnectionProfile(busy_timeout=0, retry_backoff=0.02)
+    db.profile.apply(db.connection)
+    blocker = sqlite3.connect(db.db_path, check_same_thread=False)
+    blocker.execute("BEGIN EXCLUSIVE")
+    timer = threading.Timer(0.1, blocker.commit)
+    timer.start()
+    db.change_participant_name("test-exchange", "Carol", "Caroline")
+    timer.join()
+    blocker.close()
+    assert db.get_active_name("test-exchange", "Carol") == "Caroline"
+
+    db.profile.write_retries = 0
+    blocker = sqlite3.connect(db.db_path)
+    blocker.execute("BEGIN EXCLUSIVE")
+    with pytest.raises(sqlite3.OperationalError):
+        db.change_participant_name("test-exchange", "Caroline", "Carol")
+    blocker.rollback()
+    blocker.close()
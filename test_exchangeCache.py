@@ -0,0 +1,65 @@
+from pathlib import Path
+
+import pytest
+
+from databaseHandler import DatabaseHandler
+from exchange import Exchange
+from exchangeCache import ExchangeCache
+from match import Match
+from participant import Participant
+
+
+@pytest.fixture
+def db(tmp_path: Path):
+    db = DatabaseHandler(str(tmp_path / "db.sqlite"))
+    for name in ["First", "Second", "Third"]:
+        participants = [Participant(names=n) for n in ["Alice", "Bob"]]
+        pairing = [
+            Match(participants[0].uuid, participants[1].uuid),
+            Match(participants[1].uuid, participants[0].uuid),
+        ]
+        db.create_exchange(
+            Exchange(name, participants, [], pairing),
+            participants,
+            [],
+            pairing,
+        )
+    yield db
+    db.close_connection()
+
+
+def test_exchange_cache(db: DatabaseHandler):
+    cache = ExchangeCache(maxsize=2)
+    first = cache.get_exchange(db, "first")
+    assert first.name == "First"
+    assert cache.get_exchange(db, "first") is first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.get_exchange(db, "second")
+    cache.get_exchange(db, "first")
+    cache.get_exchange(db, "third")
+    assert len(cache) == 2
+    assert cache.get_exchange(db, "first") is first
+    cache.get_exchange(db, "second")
+    assert (cache.hits, cache.misses) == (3, 4)
+
+    with pytest.raises(ValueError):
+        cache.get_exchange(db, "fourth")
+
+
+def test_exchange_cache_invalidate(db: DatabaseHandler):
+    cache = ExchangeCache()
+    assert cache.get_exchange(db, "first").participants[0].get_name() == "Alice"
+    cache.invalidate("first")
+    assert cache.get_exchange(db, "first").participants[0].get_name() == "Alice"
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_exchange_cache_version(db: DatabaseHandler):
+    cache = ExchangeCache()
+    assert cache.get_exchange(db, "first").participants[0].get_name() == "Alice"
+    # Renamed without invalidating, like another process would
+    db.change_participant_name("first", "Alice", "Alicia")
+    assert cache.get_exchange(db, "first").participants[0].get_name() == "Alicia"
+    assert cache.get_exchange(db, "first").participants[0].get_name() == "Alicia"
+    assert (cache.hits, cache.misses) == (1, 2)
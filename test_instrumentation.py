@@ -0,0 +1,132 @@
+import logging
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from databaseHandler import DatabaseHandler
+from instrumentation import (
+    Metrics,
+    QueryProfiler,
+    RequestMetrics,
+    format_metric,
+    normalize_query,
+    observe_cursor,
+)
+
+
+def test_observed_cursor():
+    connection = sqlite3.connect(":memory:")
+    statements = []
+    cursor = observe_cursor(
+        connection.cursor(),
+        lambda statement, parameters, seconds: statements.append(
+            (statement, parameters, seconds),
+        ),
+    )
+    cursor.execute("CREATE TABLE t(x INTEGER)")
+    cursor.executemany("INSERT INTO t VALUES (?)", ((i,) for i in range(3)))
+    assert cursor.execute("SELECT sum(x) FROM t").fetchone() == (3,)
+    assert [statement for statement, _parameters, _seconds in statements] == [
+        "CREATE TABLE t(x INTEGER)",
+        "INSERT INTO t VALUES (?)",
+        "SELECT sum(x) FROM t",
+    ]
+    assert statements[1][1] == (0,)
+    assert all(seconds >= 0 for _statement, _parameters, seconds in statements)
+
+    plain_cursor = connection.cursor()
+    assert observe_cursor(plain_cursor, None) is plain_cursor
+    connection.close()
+
+
+def test_request_metrics():
+    request_metrics = RequestMetrics()
+    request_metrics.record_statement("SELECT 1", (), 0.002)
+    request_metrics.record_statement("SELECT 2", (), 0.001)
+    assert request_metrics.sql_statements == 2
+    assert request_metrics.server_timing(0.01) == (
+        'total;dur=10.00, db;dur=3.00;desc="2 queries", render;dur=0.00'
+    )
+
+    request_metrics.render_started()
+    request_metrics.render_finished()
+    request_metrics.render_finished()
+    assert request_metrics.render_seconds > 0
+    request_metrics.record_pairing(42, 0.005)
+    assert request_metrics.server_timing(0.01).endswith(
+        'pairing;dur=5.00;desc="42 attempts"',
+    )
+
+
+def test_metrics():
+    metrics = Metrics()
+    request_metrics = RequestMetrics()
+    request_metrics.record_statement("SELECT 1", (), 0.5)
+    metrics.record("view_exchange", "GET", 200, request_metrics, 0.02)
+    metrics.record("view_exchange", "GET", 200, RequestMetrics(), 3)
+    text = metrics.render()
+    assert (
+        'secret_gift_swap_requests_total{endpoint="view_exchange",method="GET",'
+        'status="200"} 2\n'
+    ) in text
+    assert (
+        'secret_gift_swap_request_duration_seconds_bucket{endpoint="view_exchange",'
+        'le="0.025"} 1\n'
+    ) in text
+    assert (
+        'secret_gift_swap_request_duration_seconds_bucket{endpoint="view_exchange",'
+        'le="+Inf"} 2\n'
+    ) in text
+    assert 'secret_gift_swap_sql_statements_total{endpoint="view_exchange"} 1\n' in text
+    assert "# TYPE secret_gift_swap_request_duration_seconds histogram\n" in text
+
+    metrics.clear()
+    assert "view_exchange" not in metrics.render()
+
+
+def test_format_metric():
+    assert format_metric("hits_total", "counter", "Hits.", [({"name": 'a"b'}, 1)]) == (
+        "# HELP secret_gift_swap_hits_total Hits.\n"
+        "# TYPE secret_gift_swap_hits_total counter\n"
+        'secret_gift_swap_hits_total{name="a\\"b"} 1\n'
+    )
+
+
+def test_normalize_query():
+    assert normalize_query("SELECT 1 FROM exchanges WHERE slug = ?") == (
+        "SELECT ? FROM exchanges WHERE slug = ?"
+    )
+    assert normalize_query(
+        "SELECT name FROM participant_names\n WHERE name IN (?, ?,?) AND x = 'it''s'",
+    ) == ("SELECT name FROM participant_names WHERE name IN (?) AND x = ?")
+    assert normalize_query("SELECT * FROM t2 WHERE id = %s AND n = ANY(%s)") == (
+        "SELECT * FROM t2 WHERE id = ? AND n = ANY(?)"
+    )
+
+
+def test_query_profiler(tmp_path: Path, caplog: pytest.LogCaptureFixture):
+    profiler = QueryProfiler(threshold=0)
+    db = DatabaseHandler(str(tmp_path / "db.sqlite"), profiler=profiler)
+    with caplog.at_level(logging.WARNING, logger="instrumentation"):
+        db.exchange_exists("first")
+        db.exchange_exists("second")
+    db.close_connection()
+    [query] = profiler.queries()
+    assert query["query"] == "SELECT ? FROM exchanges WHERE slug = ?"
+    assert query["calls"] == query["slow_calls"] == 2
+    assert query["max_seconds"] <= query["seconds"]
+    assert "exchanges" in query["plan"]
+    assert "Slow query" in caplog.text
+    assert "first" not in caplog.text
+
+    profiler = QueryProfiler(threshold=10)
+    db = DatabaseHandler(str(tmp_path / "db.sqlite"), profiler=profiler)
+    db.exchange_exists("first")
+    db.close_connection()
+    [query] = profiler.queries()
+    assert query["slow_calls"] == 0
+    assert "plan" not in query
+
+    profiler.clear()
+    assert profiler.queries() == []
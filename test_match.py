@@ -0,0 +1,24 @@
+from match import Match, PairingIndex, get_giftee_for_giver, get_giver_for_giftee
+from participant import Participant
+
+
+def test_match_hashable():
+    p1 = Participant(names="Alice").uuid
+    p2 = Participant(names="Bob").uuid
+    assert Match(p1, p2) == Match(p1, p2)
+    assert Match(p1, p2) != Match(p2, p1)
+    assert len({Match(p1, p2), Match(p1, p2), Match(p2, p1)}) == 2
+    pairing = [Match(p1, p2), Match(p2, p1)]
+    assert get_giftee_for_giver(pairing, p1) == p2
+    assert get_giver_for_giftee(pairing, p1) == p2
+
+
+def test_pairing_index():
+    p1, p2, p3 = (Participant(names=name).uuid for name in ["Alice", "Bob", "Carol"])
+    pairing = [Match(p1, p2), Match(p2, p3), Match(p3, p1)]
+    index = PairingIndex(pairing)
+    assert len(index) == 3
+    for p in [p1, p2, p3]:
+        assert get_giftee_for_giver(index, p) == get_giftee_for_giver(pairing, p)
+        assert get_giver_for_giftee(index, p) == get_giver_for_giftee(pairing, p)
+    assert get_giftee_for_giver(index, Participant(names="Dave").uuid) is None
@@ -0,0 +1,37 @@
+import pytest
+
+from participant import (
+    Participant,
+    ParticipantRegistry,
+    get_participant_by_id,
+    get_participants_by_name,
+    get_single_participant_by_name,
+)
+
+
+def test_participant_registry():
+    alice = Participant(names="Alice")
+    bob = Participant(names=["Bob", "Robert"], active_name=1)
+    registry = ParticipantRegistry([alice, bob])
+    assert len(registry) == 2
+    assert list(registry) == [alice, bob]
+    assert get_participant_by_id(registry, bob.uuid) is bob
+    assert get_participant_by_id(registry, Participant(names="Carol").uuid) is None
+    assert get_single_participant_by_name(registry, "Bob") is bob
+    assert get_single_participant_by_name(registry, "Robert") is bob
+
+    registry.change_name(alice.uuid, "Alicia")
+    assert alice.get_name() == "Alicia"
+    assert get_single_participant_by_name(registry, "Alice") is alice
+    assert get_single_participant_by_name(registry, "Alicia") is alice
+
+    registry.change_name(bob.uuid, "Alicia")
+    assert get_participants_by_name(registry, "Alicia") == [alice, bob]
+    assert get_participants_by_name(registry, "Alicia") == get_participants_by_name(
+        registry.participants,
+        "Alicia",
+    )
+    with pytest.raises(ValueError):
+        get_single_participant_by_name(registry, "Alicia")
+    with pytest.raises(ValueError):
+        registry.change_name(Participant(names="Carol").uuid, "Caroline")
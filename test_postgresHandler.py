@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from exchange import Exchange
+
+psycopg = pytest.importorskip("psycopg")
+pytest.importorskip("psycopg_pool")
+
+from postgresHandler import PostgresConnectionPool, PostgresHandler, migrate  # noqa: E402
+
+
+def test_connection_pool(postgres_conninfo: str, exchange: Exchange):
+    pool = PostgresConnectionPool(postgres_conninfo, min_size=1, max_size=2)
+    db = PostgresHandler(pool=pool)
+    assert not db.exchange_exists("test-exchange")
+    db.create_exchange(
+        exchange,
+        exchange.participants,
+        exchange.constraints,
+        exchange.pairing,
+    )
+    db.close_connection()
+    db = PostgresHandler(pool=pool)
+    assert db.exchange_exists("test-exchange")
+    db.close_connection()
+    pool.close()
+
+
+def test_concurrent_migrate(postgres_conninfo: str):
+    barrier = threading.Barrier(4)
+    errors = []
+
+    def start_instance() -> None:
+        with psycopg.connect(postgres_conninfo, autocommit=True) as connection:
+            barrier.wait()
+            try:
+                migrate(connection)
+            except psycopg.Error as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=start_instance) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
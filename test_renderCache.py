@@ -0,0 +1,41 @@
+import sys
+
+from renderCache import PageKey, RenderCache
+
+
+def key(slug: str, participant: str = "", version: int = 1) -> PageKey:
+    return PageKey("exchange-user-result.html", slug, participant, "en", version)
+
+
+def test_render_cache():
+    page = "<p>Alice</p>"
+    cache = RenderCache(maxsize=2 * sys.getsizeof(page))
+    assert cache.get(key("first", "Alice")) is None
+    cache.put(key("first", "Alice"), page)
+    assert cache.get(key("first", "Alice")) == page
+    assert cache.get(key("first", "Alice", version=2)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    cache.put(key("first", "Carol"), "<p>Carol</p>")
+    cache.get(key("first", "Alice"))
+    cache.put(key("second", "Bobby"), "<p>Bobby</p>")
+    assert len(cache) == 2
+    assert cache.size <= cache.maxsize
+    assert cache.get(key("first", "Carol")) is None
+    assert cache.get(key("first", "Alice")) == page
+
+    cache.put(key("first", "Dave"), "x" * cache.maxsize)
+    assert cache.get(key("first", "Dave")) is None
+
+
+def test_render_cache_invalidate():
+    cache = RenderCache()
+    cache.put(key("first", "Alice"), "<p>Alice</p>")
+    cache.put(key("first"), "<p>Overview</p>")
+    cache.put(key("second", "Alice"), "<p>Alice</p>")
+    cache.invalidate("first")
+    assert cache.get(key("first", "Alice")) is None
+    assert cache.get(key("first")) is None
+    assert cache.get(key("second", "Alice")) == "<p>Alice</p>"
+    assert len(cache) == 1
+    assert cache.size == sys.getsizeof("<p>Alice</p>")
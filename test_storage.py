@@ -0,0 +1,154 @@
+"""Tests every storage backend has to pass."""
+
+import functools
+from pathlib import Path
+
+import pytest
+
+from exchange import Exchange
+from match import Match
+from participant import Participant
+from storage import StorageBackend
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def make_db(request: pytest.FixtureRequest, tmp_path: Path):
+    # Opens handlers on the same empty database
+    if request.param == "postgres":
+        conninfo = request.getfixturevalue("postgres_conninfo")
+        from postgresHandler import PostgresHandler
+
+        return functools.partial(PostgresHandler, conninfo)
+    from databaseHandler import DatabaseHandler
+
+    return functools.partial(DatabaseHandler, str(tmp_path / "db.sqlite"))
+
+
+@pytest.fixture
+def db(make_db: functools.partial, exchange: Exchange):
+    db = make_db()
+    db.create_exchange(
+        exchange,
+        exchange.participants,
+        exchange.constraints,
+        exchange.pairing,
+    )
+    yield db
+    db.close_connection()
+
+
+def test_get_exchange(db: StorageBackend, exchange: Exchange):
+    result = db.get_exchange("test-exchange")
+    assert result.name == "Test Exchange"
+    assert [p.names for p in result.participants] == [
+        p.names for p in exchange.participants
+    ]
+    assert [p.get_name() for p in result.participants] == [
+        "Alice",
+        "Robert",
+        "Carol",
+    ]
+    assert result.constraints == exchange.constraints
+    assert result.pairing == exchange.pairing
+    bob = result.participants[1]
+    assert result.participant_registry.get_by_name("Bob") == [bob]
+    assert (
+        result.pairing_index.get_giftee_for_giver(bob.uuid)
+        == result.participants[0].uuid
+    )
+    with pytest.raises(ValueError):
+        db.get_exchange("other-exchange")
+
+
+def test_exchange_exists(db: StorageBackend, make_db: functools.partial):
+    assert db.exchange_exists("test-exchange")
+    assert not db.exchange_exists("other-exchange")
+    other_db = make_db()
+    assert other_db.exchange_exists("test-exchange")
+    other_db.close_connection()
+
+
+def test_participant_lookups(db: StorageBackend):
+    assert db.get_giftee_for_giver("test-exchange", "Alice").get_name() == "Carol"
+    assert db.get_giver_for_giftee("test-exchange", "Alice").get_name() == "Robert"
+    assert db.get_active_name("test-exchange", "Bob") == "Robert"
+    assert db.participant_name_available("test-exchange", "Alice", "Alicia")
+    assert not db.participant_name_available("test-exchange", "Alice", "Bob")
+    db.change_participant_name("test-exchange", "Carol", "Caroline")
+    assert db.get_active_name("test-exchange", "Carol") == "Caroline"
+    assert db.get_giftee_for_giver("test-exchange", "Alice").get_name() == "Caroline"
+    db.change_participant_name("test-exchange", "Caroline", "Carol")
+    assert db.get_active_name("test-exchange", "Caroline") == "Carol"
+    with pytest.raises(ValueError):
+        db.get_active_name("test-exchange", "Dave")
+
+
+def test_get_exchange_name(db: StorageBackend, exchange: Exchange):
+    assert db.get_exchange_name("test-exchange") == "Test Exchange"
+    with pytest.raises(ValueError):
+        db.get_exchange_name("other-exchange")
+    participant = exchange.participants[1]
+    assert db.get_participant(participant.uuid).names == participant.names
+
+
+def test_exchange_version(db: StorageBackend):
+    assert db.get_exchange_version("test-exchange") == 1
+    assert db.get_exchange_version("other-exchange") == 0
+    db.change_participant_name("test-exchange", "Alice", "Alicia")
+    assert db.get_exchange_version("test-exchange") == 2
+
+
+def test_names_available(db: StorageBackend):
+    assert db.names_available(
+        ["test-exchange", "other-exchange"],
+        "test-exchange",
+        ["Alice", "Bob", "Robert", "Dave"],
+    ) == (
+        {"test-exchange": False, "other-exchange": True},
+        {"Alice": False, "Bob": False, "Robert": False, "Dave": True},
+    )
+    assert db.names_available([], "test-exchange", ["Bob", "Alice"], "Robert") == (
+        {},
+        {"Bob": True, "Alice": False},
+    )
+    assert db.names_available([], "other-exchange", ["Alice"]) == ({}, {"Alice": True})
+    assert db.names_available([], "test-exchange", []) == ({}, {})
+
+
+def test_get_participant_result(db: StorageBackend):
+    assert db.get_participant_result("test-exchange", "Bob") == (
+        "Test Exchange",
+        "Robert",
+        "Alice",
+        "Carol",
+    )
+    db.change_participant_name("test-exchange", "Alice", "Alicia")
+    assert db.get_participant_result("test-exchange", "Alice") == (
+        "Test Exchange",
+        "Alicia",
+        "Carol",
+        "Robert",
+    )
+    with pytest.raises(ValueError):
+        db.get_participant_result("test-exchange", "Dave")
+    with pytest.raises(ValueError):
+        db.get_participant_result("other-exchange", "Alice")
+
+
+def test_create_exchange_rolls_back(make_db: functools.partial):
+    db = make_db()
+    participants = [Participant(names="Alice"), Participant(names="Alice")]
+    pairing = [
+        Match(participants[0].uuid, participants[1].uuid),
+        Match(participants[1].uuid, participants[0].uuid),
+    ]
+    with pytest.raises(db.IntegrityError):
+        db.create_exchange(
+            Exchange("Broken Exchange", participants, [], pairing),
+            participants,
+            [],
+            pairing,
+        )
+    assert not db.exchange_exists("broken-exchange")
+    assert db.connection.execute("SELECT * FROM participants").fetchall() == []
+    db.close_connection()
@@ -1,11 +1,22 @@
+import contextlib
 import random
 
 import pytest
 
-from constraint import Constraint
+from constraint import Constraint, compile_constraints
 from match import Match
 from participant import Participant
-from utils import _accept_pairing, _generate_pairing, get_pairing_with_probabilities
+from utils import (
+    PairingStatistics,
+    _accept_pairing,
+    _generate_derangement,
+    _generate_pairing,
+    estimate_acceptance,
+    get_pairing_batched,
+    get_pairing_exact,
+    get_pairing_parallel,
+    get_pairing_with_probabilities,
+)
 
 
 def test_generate_pairing():
@@ -100,7 +111,7 @@ def test_get_pairing_with_probabilities():
         Match(pd.uuid, pc.uuid),
     ]
 
-    random.seed(6851)
+    random.seed(6893)
 
     assert sorted(
         get_pairing_with_probabilities(
@@ -130,7 +141,7 @@ def test_get_pairing_with_probabilities():
             ],
         )
 
-    random.seed(6951)
+    random.seed(6962)
 
     with pytest.warns(
         UserWarning,
@@ -154,3 +165,277 @@ def test_get_pairing_with_probabilities():
             Match(pc.uuid, pb.uuid),
             Match(pd.uuid, pc.uuid),
         ]
+
+
+def test_get_pairing_exact():
+    pa = Participant(names="a", uuid="a")
+    pb = Participant(names="b", uuid="b")
+    pc = Participant(names="c", uuid="c")
+    pd = Participant(names="d", uuid="d")
+
+    assert sorted(
+        get_pairing_exact(
+            participants=[pa, pb, pc, pd],
+            pairs_with_probabilities=[
+                Constraint(pa.uuid, pb.uuid, "never"),
+                Constraint(pa.uuid, pc.uuid, "never"),
+            ],
+        ),
+        key=lambda m: m.giver_id,
+    ) == [
+        Match(pa.uuid, pd.uuid),
+        Match(pb.uuid, pc.uuid),
+        Match(pc.uuid, pb.uuid),
+        Match(pd.uuid, pa.uuid),
+    ]
+
+    assert sorted(
+        get_pairing_exact(
+            participants=[pa, pb, pc, pd],
+            pairs_with_probabilities=[
+                Constraint(pa.uuid, pb.uuid, "1_past_exchange"),
+                Constraint(pa.uuid, pc.uuid, "1_past_exchange"),
+                Constraint(pb.uuid, pc.uuid, "1_past_exchange"),
+                Constraint(pb.uuid, pd.uuid, "1_past_exchange"),
+                Constraint(pc.uuid, pa.uuid, "1_past_exchange"),
+                Constraint(pc.uuid, pd.uuid, "1_past_exchange"),
+                Constraint(pd.uuid, pa.uuid, "1_past_exchange"),
+                Constraint(pd.uuid, pb.uuid, "1_past_exchange"),
+            ],
+        ),
+        key=lambda m: m.giver_id,
+    ) == [
+        Match(pa.uuid, pd.uuid),
+        Match(pb.uuid, pa.uuid),
+        Match(pc.uuid, pb.uuid),
+        Match(pd.uuid, pc.uuid),
+    ]
+
+    with pytest.raises(ValueError):
+        get_pairing_exact(
+            participants=[pa, pb, pc, pd],
+            pairs_with_probabilities=[
+                Constraint(pa.uuid, pb.uuid, "1_past_exchange"),
+                Constraint(pa.uuid, pc.uuid, "1_past_exchange"),
+                Constraint(pa.uuid, pd.uuid, "1_past_exchange"),
+            ],
+        )
+
+    with pytest.raises(ValueError):
+        get_pairing_exact(participants=[pa])
+
+
+def test_get_pairing_exact_dense_constraints():
+    random.seed(7102)
+    participants = [Participant(names=str(i), uuid=i) for i in range(60)]
+    # Everyone may only give to the next three people
+    constraints = [
+        Constraint(giver, giftee, "1_past_exchange")
+        for giver in range(60)
+        for giftee in range(60)
+        if giver != giftee and (giftee - giver) % 60 > 3
+    ]
+    pairing = get_pairing_exact(participants, constraints)
+    assert sorted(m.giver_id for m in pairing) == list(range(60))
+    assert sorted(m.giftee_id for m in pairing) == list(range(60))
+    for m in pairing:
+        assert 0 < (m.giftee_id - m.giver_id) % 60 <= 3
+
+
+def test_generate_derangement():
+    random.seed(7203)
+    for size in [2, 3, 10, 50]:
+        derangement = _generate_derangement(size)
+        assert sorted(derangement) == list(range(size))
+        assert all(giver != giftee for giver, giftee in enumerate(derangement))
+
+    with pytest.raises(ValueError):
+        _generate_derangement(1)
+
+
+def test_get_pairing_batched():
+    pa = Participant(names="a", uuid="a")
+    pb = Participant(names="b", uuid="b")
+    pc = Participant(names="c", uuid="c")
+    pd = Participant(names="d", uuid="d")
+
+    assert sorted(
+        get_pairing_batched([pa, pb, pc], seed=7301),
+        key=lambda m: m.giver_id,
+    ) in [
+        [Match(pa.uuid, pb.uuid), Match(pb.uuid, pc.uuid), Match(pc.uuid, pa.uuid)],
+        [Match(pa.uuid, pc.uuid), Match(pb.uuid, pa.uuid), Match(pc.uuid, pb.uuid)],
+    ]
+
+    assert sorted(
+        get_pairing_batched(
+            participants=[pa, pb, pc, pd],
+            pairs_with_probabilities=[
+                Constraint(pa.uuid, pb.uuid, "1_past_exchange"),
+                Constraint(pa.uuid, pc.uuid, "1_past_exchange"),
+                Constraint(pb.uuid, pc.uuid, "1_past_exchange"),
+                Constraint(pb.uuid, pd.uuid, "1_past_exchange"),
+                Constraint(pc.uuid, pa.uuid, "1_past_exchange"),
+                Constraint(pc.uuid, pd.uuid, "1_past_exchange"),
+                Constraint(pd.uuid, pa.uuid, "1_past_exchange"),
+                Constraint(pd.uuid, pb.uuid, "1_past_exchange"),
+            ],
+            seed=7302,
+        ),
+        key=lambda m: m.giver_id,
+    ) == [
+        Match(pa.uuid, pd.uuid),
+        Match(pb.uuid, pa.uuid),
+        Match(pc.uuid, pb.uuid),
+        Match(pd.uuid, pc.uuid),
+    ]
+
+    with pytest.raises(ValueError):
+        get_pairing_batched(
+            participants=[pa, pb, pc, pd],
+            pairs_with_probabilities=[
+                Constraint(pa.uuid, pb.uuid, "never"),
+                Constraint(pa.uuid, pc.uuid, "never"),
+                Constraint(pa.uuid, pd.uuid, "never"),
+            ],
+            seed=7303,
+        )
+
+
+def test_get_pairing_parallel():
+    participants = [Participant(names=str(i), uuid=i) for i in range(8)]
+    constraints = [
+        Constraint(giver, (giver + 1) % 8, "never") for giver in range(8)
+    ] + [Constraint(giver, (giver + 2) % 8, "3_past_exchange") for giver in range(8)]
+    pairing = get_pairing_parallel(
+        participants,
+        constraints,
+        workers=2,
+        random_seed=7401,
+    )
+    assert sorted(m.giftee_id for m in pairing) == list(range(8))
+    for m in pairing:
+        assert m.giver_id != m.giftee_id
+        assert (m.giftee_id - m.giver_id) % 8 not in [1, 7]
+    assert (
+        get_pairing_parallel(
+            participants,
+            constraints,
+            workers=2,
+            random_seed=7401,
+        )
+        == pairing
+    )
+
+    with pytest.raises(ValueError):
+        get_pairing_parallel(
+            participants[:3],
+            [Constraint(0, 1, "never"), Constraint(0, 2, "never")],
+            workers=2,
+        )
+
+
+def test_pairing_statistics():
+    participants = [Participant(names=str(i), uuid=i) for i in range(3)]
+    impossible = [Constraint(0, 1, "never"), Constraint(0, 2, "never")]
+
+    statistics = PairingStatistics()
+    random.seed(7501)
+    get_pairing_with_probabilities(participants, statistics=statistics)
+    assert statistics.attempts >= 1
+    statistics = PairingStatistics()
+    with pytest.raises(ValueError):
+        get_pairing_with_probabilities(
+            participants,
+            impossible,
+            retries=10,
+            statistics=statistics,
+        )
+    assert statistics.attempts == 0
+    assert statistics.outcome == "impossible"
+
+    statistics = PairingStatistics()
+    with pytest.raises(ValueError):
+        get_pairing_batched(
+            participants,
+            impossible,
+            retries=100,
+            seed=7502,
+            statistics=statistics,
+        )
+    assert statistics.attempts == 100
+
+    statistics = PairingStatistics()
+    get_pairing_exact(participants, statistics=statistics)
+    assert statistics.attempts == 1
+
+
+def test_estimate_acceptance():
+    uuids = list(range(4))
+    assert estimate_acceptance(compile_constraints([]), uuids) == 1
+    constraints = compile_constraints(
+        [Constraint(0, giftee, "2_past_exchange") for giftee in [1, 2, 3]],
+    )
+    assert estimate_acceptance(constraints, uuids) == pytest.approx(0.2)
+    assert estimate_acceptance(constraints, uuids, 2) == pytest.approx(0.4)
+    assert (
+        estimate_acceptance(compile_constraints([Constraint(0, 1, "never")]), [0, 1])
+        == 0
+    )
+
+
+def test_get_pairing_with_probabilities_statistics():
+    participants = [Participant(names=str(i), uuid=i) for i in range(4)]
+    constraints = [Constraint(0, giftee, "2_past_exchange") for giftee in [1, 2, 3]]
+
+    random.seed(7601)
+    statistics = PairingStatistics()
+    get_pairing_with_probabilities(participants, constraints, statistics=statistics)
+    assert statistics.outcome == "accepted"
+    assert statistics.estimated_acceptance == pytest.approx(0.2)
+    assert statistics.attempts == sum(statistics.attempts_per_round)
+    assert statistics.attempts_per_round[0] <= 15
+    assert sum(statistics.rejections.values()) == statistics.attempts - 1
+    assert set(statistics.rejections) <= {(0, 1), (0, 2), (0, 3)}
+    assert statistics.seconds > 0
+
+    statistics = PairingStatistics()
+    with pytest.raises(ValueError):
+        get_pairing_with_probabilities(
+            participants,
+            constraints,
+            statistics=statistics,
+            max_attempts=0,
+        )
+    assert statistics.outcome == "unlikely"
+    assert statistics.attempts == 0
+
+    # Too unlikely for one round at the original probabilities, but raising
+    # them helps, so the budget has to last for all rounds
+    rng = random.Random(7602)
+    crowd = [Participant(names=str(i), uuid=i) for i in range(30)]
+    dense = [
+        Constraint(giver, giftee, "2_past_exchange")
+        for giver in range(30)
+        for giftee in range(30)
+        if giver != giftee and rng.random() < 0.26
+    ]
+    statistics = PairingStatistics()
+    assert estimate_acceptance(compile_constraints(dense), list(range(30))) < 0.006
+    random.seed(7603)
+    with pytest.warns(UserWarning, match="Increasing probabilities"):  # noqa: SIM117
+        with contextlib.suppress(ValueError):
+            get_pairing_with_probabilities(crowd, dense, statistics=statistics)
+    assert statistics.attempts_per_round[0] <= 100
+    assert len(statistics.attempts_per_round) > 1
+
+    # a and b can only give to c, which nobody can tell from a single row
+    statistics = PairingStatistics()
+    with pytest.raises(ValueError):
+        get_pairing_with_probabilities(
+            participants[:3],
+            [Constraint(0, 1, "never")],
+            statistics=statistics,
+        )
+    assert statistics.outcome == "impossible"
+    assert statistics.attempts == 0
@@ -1,17 +1,77 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
 import warnings
-from copy import deepcopy
-from random import random, shuffle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from math import ceil, prod
+from random import Random, random, randrange, sample, seed, shuffle
+from time import monotonic
+from typing import TYPE_CHECKING, Callable
 
+import numpy as np
 from slugify import slugify as og_slugify
 
 from constraint import (
     Constraint,
+    ConstraintIndex,
+    compile_constraints,
     get_all_probability_values_from_constraints,
-    get_probability_from_constraints,
-    get_restricted_pairs,
 )
 from match import Match
-from participant import Participant
+
+if TYPE_CHECKING:
+    from uuid import UUID
+
+    from participant import Participant
+
+# Upper bound for the number of entries in one batch of candidate pairings
+_BATCH_ELEMENTS = 1 << 20
+
+# Worker processes for get_pairing_parallel, started once per number of workers
+_executors: dict[int | None, ProcessPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+# Give up sampling when fewer pairings than this are expected to be accepted
+# within the remaining attempts
+_HOPELESS_EXPECTED_PAIRINGS = 0.05
+
+# Fewest pairings to try in a round before raising probabilities
+_MIN_ROUND_ATTEMPTS = 100
+
+
+class PairingStatistics:
+    """What a pairing solver did, filled in while it runs.
+
+    All solvers count their attempts. The other fields are only filled in by
+    get_pairing_with_probabilities.
+    """
+
+    __slots__ = (
+        "attempts",
+        "attempts_per_round",
+        "estimated_acceptance",
+        "outcome",
+        "probability_multiplier",
+        "rejections",
+        "seconds",
+    )
+
+    def __init__(self):
+        """Start with nothing done yet."""
+        self.attempts = 0
+        # Pairings tried with each probability multiplier
+        self.attempts_per_round = []
+        # How often each constrained (giver, giftee) pair rejected a pairing
+        self.rejections = {}
+        self.probability_multiplier = 1.0
+        # Estimated chance of accepting a pairing in the first round
+        self.estimated_acceptance = None
+        # "accepted", "impossible", "unlikely" or "exhausted"
+        self.outcome = None
+        self.seconds = 0.0
 
 
 def slugify(text: str) -> str:
@@ -36,6 +96,38 @@ def slugify(text: str) -> str:
     return slug
 
 
+def _generate_derangement(size: int) -> list[int]:
+    """Draw a random permutation of participant indices without fixed points.
+
+    Shuffles with Fisher-Yates from the back and starts over as soon as an
+    index ends up in its own place, which rejects self gifts without
+    finishing the shuffle first. Every valid result is equally likely.
+
+    Args:
+        size (int): Number of participants
+
+    Raises:
+        ValueError: If there are none or just one participant
+
+    Returns:
+        list[int]: Index of the giftee for every giver index
+
+    """
+    if size < 2:
+        raise ValueError("Can't generate a pairing for just one participant!")
+    giftees = list(range(size))
+    i = size - 1
+    while i >= 0:
+        j = randrange(i + 1)
+        giftees[i], giftees[j] = giftees[j], giftees[i]
+        if giftees[i] == i:
+            giftees = list(range(size))
+            i = size - 1
+        else:
+            i -= 1
+    return giftees
+
+
 def _generate_pairing(participants: list[Participant]) -> list[Match]:
     """Generate a single pairing from a list of participants.
 
@@ -49,33 +141,22 @@ def _generate_pairing(participants: list[Participant]) -> list[Match]:
         list[Match]: Matching of participants
 
     """
-    if len(participants) < 2:
-        raise ValueError("Can't generate a pairing for just one participant!")
-    shuffled_givers = deepcopy(participants)
-    shuffled_giftees = deepcopy(participants)
-    shuffle(shuffled_givers)
-    no_self_gifts = False
-    while not no_self_gifts:
-        shuffle(shuffled_giftees)
-        no_self_gifts = True
-        for giver, giftee in zip(shuffled_givers, shuffled_giftees):
-            if giver == giftee:
-                no_self_gifts = False
     return [
-        Match(giver.uuid, giftee.uuid)
-        for giver, giftee in zip(shuffled_givers, shuffled_giftees)
+        Match(participants[giver].uuid, participants[giftee].uuid)
+        for giver, giftee in enumerate(_generate_derangement(len(participants)))
     ]
 
 
 def _accept_pairing(
-    pairs_with_probabilities: list[Constraint],
+    pairs_with_probabilities: list[Constraint] | ConstraintIndex,
     pairing: list[Match],
     probability_multiplier: float = 1.0,
 ) -> bool:
     """Decide if pairing should be accepted given probabilities for specific pairs.
 
     Args:
-        pairs_with_probabilities (list[Constraint]): Constraints
+        pairs_with_probabilities (list[Constraint] | ConstraintIndex): Constraints,
+            ideally already compiled if called repeatedly
         pairing (list[Match]): a pairing, eg generated with _generate_pairing
         probability_multiplier (float): value to multiply probabilities with,
             for situations with very few possible matches
@@ -84,33 +165,209 @@ def _accept_pairing(
         bool: true if pairing should be accepted
 
     """
+    constraint_index = compile_constraints(pairs_with_probabilities)
     for m in pairing:
-        if (m.giver_id, m.giftee_id) in get_restricted_pairs(pairs_with_probabilities):  # noqa: SIM102 for better legibility
+        if (m.giver_id, m.giftee_id) in constraint_index:  # noqa: SIM102 for better legibility
             if (
                 random()
-                > get_probability_from_constraints(
-                    pairs_with_probabilities,
-                    m.giver_id,
-                    m.giftee_id,
-                )
+                > constraint_index.get_probability(m.giver_id, m.giftee_id)
                 * probability_multiplier
             ):
                 return False
     return True
 
 
+def _accept_derangement(
+    constraint_index: ConstraintIndex,
+    uuids: list[UUID],
+    derangement: list[int],
+    probability_multiplier: float = 1.0,
+) -> bool:
+    """Decide if a pairing of participant indices should be accepted.
+
+    Same as _accept_pairing, but without having to create Match objects first.
+
+    Args:
+        constraint_index (ConstraintIndex): Compiled constraints
+        uuids (list[UUID]): UUID of every participant index
+        derangement (list[int]): Giftee index for every giver index,
+            eg generated with _generate_derangement
+        probability_multiplier (float): value to multiply probabilities with,
+            for situations with very few possible matches
+
+    Returns:
+        bool: true if pairing should be accepted
+
+    """
+    return (
+        _find_rejection(constraint_index, uuids, derangement, probability_multiplier)
+        is None
+    )
+
+
+def _find_rejection(
+    constraint_index: ConstraintIndex,
+    uuids: list[UUID],
+    derangement: list[int],
+    probability_multiplier: float = 1.0,
+) -> tuple[UUID, UUID] | None:
+    """Find the constrained pair that makes a pairing of indices be rejected.
+
+    Decides exactly like _accept_derangement, drawing the same random numbers.
+
+    Args:
+        constraint_index (ConstraintIndex): Compiled constraints
+        uuids (list[UUID]): UUID of every participant index
+        derangement (list[int]): Giftee index for every giver index
+        probability_multiplier (float): value to multiply probabilities with
+
+    Returns:
+        tuple[UUID, UUID] | None: Giver and giftee of the pair that rejected the
+        pairing, or None if it should be accepted
+
+    """
+    for giver, giftee in enumerate(derangement):
+        pair = (uuids[giver], uuids[giftee])
+        if pair in constraint_index:  # noqa: SIM102 for better legibility
+            if (
+                random()
+                > constraint_index.get_probability(*pair) * probability_multiplier
+            ):
+                return pair
+    return None
+
+
+def estimate_acceptance(
+    constraint_index: ConstraintIndex,
+    uuids: list[UUID],
+    probability_multiplier: float = 1.0,
+) -> float:
+    """Estimate the chance that a random pairing is accepted.
+
+    In a random pairing every giver gets each other participant with about the
+    same chance, so the chance that the pair of one giver is accepted is the
+    average acceptance probability of its row of the constraint matrix. The
+    estimate treats the givers as independent and multiplies these chances, and
+    does the same for the giftees, returning the smaller product. Apart from
+    rounding, it is only 0 if someone can't give or receive a gift at all.
+
+    Args:
+        constraint_index (ConstraintIndex): Compiled constraints
+        uuids (list[UUID]): UUID of every participant index
+        probability_multiplier (float): value to multiply probabilities with
+
+    Returns:
+        float: The estimated chance, between 0 and 1
+
+    """
+    return _estimate_acceptance(
+        _get_constrained_indices(constraint_index, uuids),
+        len(uuids),
+        probability_multiplier,
+    )
+
+
+def _get_constrained_indices(
+    constraint_index: ConstraintIndex,
+    uuids: list[UUID],
+) -> list[tuple[int, int, float]]:
+    if not constraint_index.probabilities:
+        return []
+    index_by_uuid = {uuid: i for i, uuid in enumerate(uuids)}
+    return [
+        (index_by_uuid[giver_id], index_by_uuid[giftee_id], probability)
+        for (giver_id, giftee_id), probability in constraint_index.probabilities.items()
+        if giver_id in index_by_uuid
+        and giftee_id in index_by_uuid
+        and giver_id != giftee_id
+    ]
+
+
+def _estimate_acceptance(
+    constrained_indices: list[tuple[int, int, float]],
+    size: int,
+    probability_multiplier: float,
+) -> float:
+    if size < 2:
+        return 0.0
+    # Expected number of rejected giftees in the row of every constrained giver,
+    # and of rejected givers in the column of every constrained giftee
+    giver_losses = {}
+    giftee_losses = {}
+    for giver, giftee, probability in constrained_indices:
+        loss = 1 - min(1.0, probability * probability_multiplier)
+        giver_losses[giver] = giver_losses.get(giver, 0) + loss
+        giftee_losses[giftee] = giftee_losses.get(giftee, 0) + loss
+    return min(
+        prod(max(0.0, 1 - loss / (size - 1)) for loss in losses.values())
+        for losses in [giver_losses, giftee_losses]
+    )
+
+
+def _pairing_exists(
+    constraint_index: ConstraintIndex,
+    uuids: list[UUID],
+) -> bool:
+    """Whether any pairing respects the constraints that forbid pairs.
+
+    Args:
+        constraint_index (ConstraintIndex): Compiled constraints
+        uuids (list[UUID]): UUID of every participant index
+
+    Returns:
+        bool: Whether a pairing exists
+
+    """
+
+    def is_allowed(giver: int, giftee: int) -> bool:
+        return giver != giftee and (
+            constraint_index.get_probability(uuids[giver], uuids[giftee]) > 0
+        )
+
+    # Start from a single cycle, so that few paths have to be searched
+    size = len(uuids)
+    assignment = [None] * size
+    owner = [None] * size
+    for giver in range(size):
+        giftee = (giver + 1) % size
+        if is_allowed(giver, giftee):
+            assignment[giver] = giftee
+            owner[giftee] = giver
+    return all(
+        assignment[giver] is not None
+        or _find_augmenting_path(giver, assignment, owner, is_allowed)
+        for giver in range(size)
+    )
+
+
 def get_pairing_with_probabilities(
     participants: list[Participant],
-    pairs_with_probabilities: list[Constraint] = [],
-    retries: int = 100,
+    pairs_with_probabilities: list[Constraint] | ConstraintIndex = [],
+    retries: int | None = None,
+    statistics: PairingStatistics | None = None,
+    max_attempts: int = 500,
 ) -> list[Match]:
     """Generate one pairing, using probabilities.
 
+    Draws random pairings until one is accepted. Each round that ends without
+    one multiplies the probabilities of constrained pairs by 1.2, for up to
+    five rounds. Unless `retries` is given, the attempts per round follow from
+    estimate_acceptance, up to an even share of the attempts left for the
+    remaining rounds. The search gives up without trying once it is not
+    expected to find a pairing within `max_attempts`. It also gives up as soon
+    as it is clear that no pairing exists at all.
+
     Args:
         participants (list[Participant]): participants
-        pairs_with_probabilities (list[Constraint], optional): Constraints to respect.
-            Defaults to empty set of constraints.
-        retries (int): How often to try to find a match
+        pairs_with_probabilities (list[Constraint] | ConstraintIndex, optional):
+            Constraints to respect. Defaults to empty set of constraints.
+        retries (int | None): How often to try to find a match per round.
+            Defaults to None, for as often as the estimated chance of
+            acceptance requires.
+        statistics (PairingStatistics | None): Filled in with what the search
+            did. Defaults to None.
+        max_attempts (int): Most pairings to try over all rounds, if `retries`
+            is not given. Defaults to 500, as many as five rounds of 100.
 
     Raises:
         ValueError: No suitable pairing found
@@ -119,29 +376,544 @@ def get_pairing_with_probabilities(
         list[Match]: A matching
 
     """
+    if statistics is None:
+        statistics = PairingStatistics()
+    start = monotonic()
+    try:
+        return _sample_pairing(
+            participants,
+            compile_constraints(pairs_with_probabilities),
+            retries,
+            statistics,
+            max_attempts,
+        )
+    finally:
+        statistics.seconds = monotonic() - start
+
+
+def _sample_pairing(
+    participants: list[Participant],
+    constraint_index: ConstraintIndex,
+    retries: int | None,
+    statistics: PairingStatistics,
+    max_attempts: int,
+) -> list[Match]:
+    """Search for a pairing for get_pairing_with_probabilities.
+
+    Args:
+        participants (list[Participant]): participants
+        constraint_index (ConstraintIndex): Compiled constraints
+        retries (int | None): Pairings to try per round, or None to adapt
+        statistics (PairingStatistics): Filled in with what the search did
+        max_attempts (int): Most pairings to try, if `retries` is None
+
+    Raises:
+        ValueError: No suitable pairing found
+
+    Returns:
+        list[Match]: A matching
+
+    """
+    if len(participants) < 2:
+        raise ValueError("Can't generate a pairing for just one participant!")
+    uuids = [p.uuid for p in participants]
     probability_multiplier = 1.0
-    for i in range(5):
-        for i in range(retries):
-            pairing = _generate_pairing(participants)
-            if _accept_pairing(
-                pairs_with_probabilities,
-                pairing,
+    rounds = 5
+    constrained_indices = _get_constrained_indices(constraint_index, uuids)
+    statistics.estimated_acceptance = _estimate_acceptance(
+        constrained_indices,
+        len(uuids),
+        probability_multiplier,
+    )
+    # Without rounding, only 0 if someone can't give or receive a gift at all
+    if statistics.estimated_acceptance == 0 and not _pairing_exists(
+        constraint_index,
+        uuids,
+    ):
+        statistics.outcome = "impossible"
+        raise ValueError("Could not generate a pairing with these constraints!")
+    # Pairs that are never allowed stay that way, whatever the multiplier
+    raising_helps = len(constraint_index) > 0 and any(
+        value > 0
+        for value in get_all_probability_values_from_constraints(constraint_index)
+    )
+    checked = False
+    for round_number in range(rounds):
+        statistics.probability_multiplier = probability_multiplier
+        if retries is None:
+            remaining = max_attempts - statistics.attempts
+            last_round = round_number == rounds - 1 or not raising_helps
+            # Probabilities only go up, so the last round is the most hopeful
+            best_acceptance = _estimate_acceptance(
+                constrained_indices,
+                len(uuids),
+                probability_multiplier * 1.2 ** (rounds - round_number - 1)
+                if raising_helps
+                else probability_multiplier,
+            )
+            if best_acceptance * remaining < _HOPELESS_EXPECTED_PAIRINGS:
+                statistics.outcome = (
+                    "unlikely"
+                    if _pairing_exists(constraint_index, uuids)
+                    else "impossible"
+                )
+                break
+            acceptance = _estimate_acceptance(
+                constrained_indices,
+                len(uuids),
+                probability_multiplier,
+            )
+            # Enough attempts to find a pairing with 95 % chance if the estimate
+            # is right, but no more than an even share of what is left, so the
+            # rounds with raised probabilities still get to run. The last round
+            # gets everything that is left.
+            round_attempts = (
+                remaining
+                if last_round
+                else min(
+                    remaining // (rounds - round_number),
+                    max(_MIN_ROUND_ATTEMPTS, ceil(3 / acceptance))
+                    if acceptance > 0
+                    else remaining,
+                )
+            )
+        else:
+            round_attempts = retries
+        # Make sure there is something to find before trying hard, or again
+        if not checked and (round_number > 0 or round_attempts > _MIN_ROUND_ATTEMPTS):
+            checked = True
+            if not _pairing_exists(constraint_index, uuids):
+                statistics.outcome = "impossible"
+                break
+        statistics.attempts_per_round.append(0)
+        for _attempt in range(round_attempts):
+            statistics.attempts += 1
+            statistics.attempts_per_round[-1] += 1
+            derangement = _generate_derangement(len(uuids))
+            rejection = _find_rejection(
+                constraint_index,
+                uuids,
+                derangement,
                 probability_multiplier,
+            )
+            if rejection is None:
+                statistics.outcome = "accepted"
+                return [
+                    Match(uuids[giver], uuids[giftee])
+                    for giver, giftee in enumerate(derangement)
+                ]
+            statistics.rejections[rejection] = (
+                statistics.rejections.get(rejection, 0) + 1
+            )
+        if not raising_helps:
+            break  # increasing the probability would not help here, so we skip that
+        if round_number < rounds - 1:
+            warnings.warn(
+                "Could not generate a pairing with given constraints "
+                f"(I tried {round_attempts} times)! "
+                "Increasing probabilities and trying again...",
+            )
+            probability_multiplier = probability_multiplier * 1.2
+    if statistics.outcome is None:
+        statistics.outcome = "exhausted"
+    raise ValueError("Could not generate a pairing with these constraints!")
+
+
+def _search_pairing(
+    uuids: list[UUID],
+    constraint_index: ConstraintIndex,
+    random_seed: int,
+    retries: int,
+    probability_multiplier: float,
+) -> tuple[list[int] | None, int]:
+    """Try a number of random pairings, for use in a worker process.
+
+    Args:
+        uuids (list[UUID]): UUID of every participant index
+        constraint_index (ConstraintIndex): Compiled constraints
+        random_seed (int): Seed for the random number generator of the process
+        retries (int): How many pairings to try
+        probability_multiplier (float): value to multiply probabilities with
+
+    Returns:
+        tuple[list[int] | None, int]: Giftee index for every giver index of the
+        first accepted pairing, or None if none was accepted, and the number of
+        pairings tried
+
+    """
+    seed(random_seed)
+    for i in range(retries):
+        derangement = _generate_derangement(len(uuids))
+        if _accept_derangement(
+            constraint_index,
+            uuids,
+            derangement,
+            probability_multiplier,
+        ):
+            return derangement, i + 1
+    return None, retries
+
+
+def _get_executor(workers: int | None) -> ProcessPoolExecutor:
+    """Get the shared process pool with the given number of workers.
+
+    The pool is created on first use. Its processes are started from a fork
+    server, or spawned where there is none, rather than forked from the calling
+    process, which may be a web server with other threads holding locks.
+
+    Args:
+        workers (int | None): Number of processes, None for one per CPU
+
+    Returns:
+        ProcessPoolExecutor: The pool
+
+    """
+    with _executors_lock:
+        if workers not in _executors:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                # Forked workers start with this module already imported
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _executors[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+            )
+        return _executors[workers]
+
+
+def get_pairing_parallel(
+    participants: list[Participant],
+    pairs_with_probabilities: list[Constraint] | ConstraintIndex = [],
+    retries: int = 100,
+    tasks: int = 16,
+    workers: int | None = None,
+    random_seed: int | None = None,
+    time_budget: float = 10.0,
+    statistics: PairingStatistics | None = None,
+) -> list[Match]:
+    """Generate one pairing, spreading the attempts over several processes.
+
+    Works like get_pairing_with_probabilities, but each round is split into
+    independent tasks with their own seed, derived from `random_seed`. The
+    result of the first task that finds a pairing is used, counted in the
+    order the tasks were created, so the result is the same for the same
+    seed regardless of which process finishes first.
+
+    Args:
+        participants (list[Participant]): participants
+        pairs_with_probabilities (list[Constraint] | ConstraintIndex, optional):
+            Constraints to respect. Defaults to empty set of constraints.
+        retries (int): How many pairings each task tries
+        tasks (int): How many tasks to run per round
+        workers (int | None): Number of processes to use. They are started on
+            the first call and shared by all later calls with the same number.
+            Defaults to None, for one per CPU.
+        random_seed (int | None): Seed the task seeds are derived from.
+            Defaults to None, for a fresh random seed.
+        time_budget (float): Seconds after which to give up
+        statistics (PairingStatistics | None): Filled in with how many pairings
+            were tried. Defaults to None.
+
+    Raises:
+        ValueError: If there are none or just one participant
+        ValueError: No suitable pairing found within the time budget
+
+    Returns:
+        list[Match]: A matching
+
+    """
+    if len(participants) < 2:
+        raise ValueError("Can't generate a pairing for just one participant!")
+    if statistics is None:
+        statistics = PairingStatistics()
+    deadline = monotonic() + time_budget
+    constraint_index = compile_constraints(pairs_with_probabilities)
+    uuids = [p.uuid for p in participants]
+    seeds = Random(random_seed)
+    probability_multiplier = 1.0
+    executor = _get_executor(workers)
+    futures = []
+    try:
+        for i in range(5):
+            futures = [
+                executor.submit(
+                    _search_pairing,
+                    uuids,
+                    constraint_index,
+                    seeds.getrandbits(64),
+                    retries,
+                    probability_multiplier,
+                )
+                for _task in range(tasks)
+            ]
+            for future in futures:
+                derangement, attempts = future.result(
+                    timeout=max(0, deadline - monotonic()),
+                )
+                statistics.attempts += attempts
+                if derangement is not None:
+                    return [
+                        Match(uuids[giver], uuids[giftee])
+                        for giver, giftee in enumerate(derangement)
+                    ]
+            if (
+                all(
+                    value == 0
+                    for value in get_all_probability_values_from_constraints(
+                        constraint_index,
+                    )
+                )
+                or len(constraint_index) == 0
             ):
-                return pairing
+                break  # increasing the probability would not help here
+            warnings.warn(
+                "Could not generate a pairing with given constraints "
+                f"(I tried {retries * tasks} times)! "
+                "Increasing probabilities and trying again...",
+            )
+            probability_multiplier = probability_multiplier * 1.2
+    except FuturesTimeoutError:
+        raise ValueError(
+            f"Could not generate a pairing within {time_budget} seconds!",
+        ) from None
+    finally:
+        # The pool is shared, so only drop the tasks that have not started yet
+        for future in futures:
+            future.cancel()
+    raise ValueError("Could not generate a pairing with these constraints!")
+
+
+def get_pairing_batched(
+    participants: list[Participant],
+    pairs_with_probabilities: list[Constraint] | ConstraintIndex = [],
+    retries: int = 4096,
+    seed: int | None = None,
+    statistics: PairingStatistics | None = None,
+) -> list[Match]:
+    """Generate one pairing, testing many candidate pairings at once with NumPy.
+
+    Works like get_pairing_with_probabilities, but candidates are generated
+    as rows of an integer matrix and checked for self gifts and constraints
+    against a dense probability matrix in a single vectorised step.
+
+    Args:
+        participants (list[Participant]): participants
+        pairs_with_probabilities (list[Constraint] | ConstraintIndex, optional):
+            Constraints to respect. Defaults to empty set of constraints.
+        retries (int): How many candidate pairings to try before increasing
+            probabilities
+        seed (int | None): Seed for the random number generator.
+            Defaults to None, for a fresh random seed.
+        statistics (PairingStatistics | None): Filled in with how many pairings
+            were tried. Defaults to None.
+
+    Raises:
+        ValueError: If there are none or just one participant
+        ValueError: No suitable pairing found
+
+    Returns:
+        list[Match]: A matching
+
+    """
+    size = len(participants)
+    if size < 2:
+        raise ValueError("Can't generate a pairing for just one participant!")
+    if statistics is None:
+        statistics = PairingStatistics()
+    constraint_index = compile_constraints(pairs_with_probabilities)
+    uuids = [p.uuid for p in participants]
+    index_by_uuid = {uuid: i for i, uuid in enumerate(uuids)}
+    probabilities = np.ones((size, size))
+    np.fill_diagonal(probabilities, 0)
+    for (giver_id, giftee_id), probability in constraint_index.probabilities.items():
+        if giver_id in index_by_uuid and giftee_id in index_by_uuid:
+            probabilities[index_by_uuid[giver_id], index_by_uuid[giftee_id]] = (
+                probability
+            )
+
+    rng = np.random.default_rng(seed)
+    givers = np.arange(size)
+    max_rows = max(1, _BATCH_ELEMENTS // size)
+    probability_multiplier = 1.0
+    for i in range(5):
+        tried = 0
+        rows = 16  # start small, so that easy constraints stay cheap
+        while tried < retries:
+            rows = min(rows, max_rows, retries - tried)
+            tried += rows
+            candidates = rng.permuted(np.tile(givers, (rows, 1)), axis=1)
+            accepted = (
+                rng.random(candidates.shape)
+                < probabilities[givers, candidates] * probability_multiplier
+            ).all(axis=1)
+            accepted_rows = np.flatnonzero(accepted)
+            if accepted_rows.size:
+                # Rows after the accepted one would not have been needed
+                statistics.attempts += int(accepted_rows[0]) + 1
+                return [
+                    Match(uuids[giver], uuids[giftee])
+                    for giver, giftee in enumerate(candidates[accepted_rows[0]])
+                ]
+            statistics.attempts += rows
+            rows *= 4
         if (
             all(
                 value == 0
                 for value in get_all_probability_values_from_constraints(
-                    pairs_with_probabilities,
+                    constraint_index,
                 )
             )
-            or len(pairs_with_probabilities) == 0
+            or len(constraint_index) == 0
         ):
             break  # increasing the probability would not help here, so we skip that
         warnings.warn(
-            "Could not generate a pairing with given constraints (I tried 100 times)! "
+            "Could not generate a pairing with given constraints "
+            f"(I tried {retries} times)! "
             "Increasing probabilities and trying again...",
         )
         probability_multiplier = probability_multiplier * 1.2
     raise ValueError("Could not generate a pairing with these constraints!")
+
+
+def _find_augmenting_path(
+    start: int,
+    assignment: list[int | None],
+    owner: list[int | None],
+    is_allowed: Callable[[int, int], bool],
+) -> bool:
+    """Reassign giftees along an alternating path so that `start` gets a giftee.
+
+    Searches breadth-first from the giver `start` through giftees that are
+    already taken, moving their giver on to another giftee, until a giftee
+    without a giver is reached. Only modifies the assignment on success.
+
+    Args:
+        start (int): Index of the giver that needs a giftee
+        assignment (list[int | None]): Giftee index for every giver index
+        owner (list[int | None]): Giver index for every giftee index
+        is_allowed (Callable[[int, int], bool]): Whether a giver may gift a giftee
+
+    Returns:
+        bool: Whether a path was found and applied
+
+    """
+    parent = {}
+    unvisited = set(range(len(owner)))
+    queue = deque([start])
+    while queue:
+        giver = queue.popleft()
+        reachable = [giftee for giftee in unvisited if is_allowed(giver, giftee)]
+        for giftee in reachable:
+            unvisited.discard(giftee)
+            parent[giftee] = giver
+            if owner[giftee] is None:
+                while True:
+                    giver = parent[giftee]
+                    previous_giftee = assignment[giver]
+                    assignment[giver] = giftee
+                    owner[giftee] = giver
+                    if giver == start:
+                        return True
+                    giftee = previous_giftee
+            queue.append(owner[giftee])
+    return False
+
+
+def get_pairing_exact(
+    participants: list[Participant],
+    pairs_with_probabilities: list[Constraint] | ConstraintIndex = [],
+    mixing_steps: int = 20,
+    statistics: PairingStatistics | None = None,
+) -> list[Match]:
+    """Generate one pairing by searching the graph of allowed pairs directly.
+
+    Unlike get_pairing_with_probabilities, this never gives up on a
+    satisfiable set of constraints: a pairing is a perfect matching of givers
+    to giftees, so one is constructed with augmenting paths, which also proves
+    infeasibility if none exists. The matching is then shuffled by randomly
+    rotating giftees between two or three givers, accepting each rotation
+    depending on the probabilities of the old and new pairs, so that pairings
+    are drawn with the same preferences as get_pairing_with_probabilities.
+
+    Args:
+        participants (list[Participant]): participants
+        pairs_with_probabilities (list[Constraint] | ConstraintIndex, optional):
+            Constraints to respect. Defaults to empty set of constraints.
+        mixing_steps (int): How many rotations to try per participant
+        statistics (PairingStatistics | None): Filled in with how many pairings
+            were tried, which is always one, as it is constructed rather than
+            drawn. Defaults to None.
+
+    Raises:
+        ValueError: If there are none or just one participant
+        ValueError: If no pairing satisfies the constraints
+
+    Returns:
+        list[Match]: A matching
+
+    """
+    if len(participants) < 2:
+        raise ValueError("Can't generate a pairing for just one participant!")
+    index_by_uuid = {p.uuid: i for i, p in enumerate(participants)}
+    restricted = {
+        (index_by_uuid[giver_id], index_by_uuid[giftee_id]): probability
+        for (giver_id, giftee_id), probability in compile_constraints(
+            pairs_with_probabilities,
+        ).probabilities.items()
+        if giver_id in index_by_uuid and giftee_id in index_by_uuid
+    }
+
+    def get_probability(giver: int, giftee: int) -> float:
+        if giver == giftee:
+            return 0
+        return restricted.get((giver, giftee), 1)
+
+    def is_allowed(giver: int, giftee: int) -> bool:
+        return get_probability(giver, giftee) > 0
+
+    if statistics is not None:
+        statistics.attempts += 1
+    # Build a perfect matching, starting from a random single cycle
+    size = len(participants)
+    order = list(range(size))
+    shuffle(order)
+    assignment = [None] * size
+    owner = [None] * size
+    for giver, giftee in zip(order, order[1:] + order[:1]):
+        if is_allowed(giver, giftee):
+            assignment[giver] = giftee
+            owner[giftee] = giver
+    for giver in order:
+        if assignment[giver] is None and not _find_augmenting_path(
+            giver,
+            assignment,
+            owner,
+            is_allowed,
+        ):
+            raise ValueError("Could not generate a pairing with these constraints!")
+
+    # Shuffle the matching by rotating the giftees of two or three random givers
+    for _step in range(mixing_steps * size):
+        givers = sample(range(size), 3 if size > 2 and random() < 0.5 else 2)
+        giftees = [assignment[giver] for giver in givers]
+        rotated_giftees = giftees[1:] + giftees[:1]
+        old_probability = prod(map(get_probability, givers, giftees))
+        new_probability = prod(map(get_probability, givers, rotated_giftees))
+        if new_probability > 0 and random() * old_probability < new_probability:
+            for giver, giftee in zip(givers, rotated_giftees):
+                assignment[giver] = giftee
+
+    return [
+        Match(participants[giver].uuid, participants[giftee].uuid)
+        for giver, giftee in enumerate(assignment)
+    ]
+
+
+pairing_solvers = {
+    "sampling": get_pairing_with_probabilities,
+    "exact": get_pairing_exact,
+    "batched": get_pairing_batched,
+    "parallel": get_pairing_parallel,
+}